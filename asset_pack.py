@@ -0,0 +1,173 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+from puzzle_layout import THUMBNAIL_SIZE, board_max_size, fit_size
+
+# Pack d'images pré-décodées : en-tête, index JSON, puis pixels RGB bruts alignés sur les pages
+#
+#   python asset_pack.py            (construit assets.pack à partir du dossier assets/)
+PACK_MAGIC = b"KCPACK1\0"
+PACK_HEADER = struct.Struct("<8sI")
+PACK_ALIGNMENT = 4096
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+PACK_FILE = "assets.pack"
+# Résolutions d'écran couvertes : une image par taille de plateau en plein écran
+PACK_RESOLUTIONS = [(1280, 720), (1920, 1080), (2560, 1440)]
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def align(offset):
+    return (offset + PACK_ALIGNMENT - 1) // PACK_ALIGNMENT * PACK_ALIGNMENT
+
+
+def file_key(image_path):
+    stat = os.stat(image_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class AssetPack:
+    # Lecture du pack par mmap : les surfaces sont créées directement depuis les pages du fichier
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = PACK_HEADER.unpack_from(self.mm, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} n'est pas un pack d'images")
+        self.index = json.loads(self.mm[PACK_HEADER.size:PACK_HEADER.size + index_length])
+        # Un pack tronqué est refusé en entier : les images sont alors décodées depuis assets/
+        for name, entry in self.index['images'].items():
+            for blob in [entry['thumbnail'], *entry['levels']]:
+                if blob['offset'] + blob['width'] * blob['height'] * 3 > len(self.mm):
+                    raise ValueError(f"{path} est tronqué ({name})")
+        self.buffer = memoryview(self.mm)
+
+    @classmethod
+    def open(cls, path):
+        # None si le pack n'a pas été construit, est illisible ou tronqué
+        try:
+            return cls(path)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return None
+
+    def entry(self, image_path):
+        # Entrée du pack, seulement si le fichier source n'a pas changé depuis la construction
+        entry = self.index['images'].get(os.path.basename(image_path))
+        if entry is None:
+            return None
+        try:
+            if tuple(entry['key']) != file_key(image_path):
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def pixels(self, blob):
+        size = (blob['width'], blob['height'])
+        offset = blob['offset']
+        return self.buffer[offset:offset + size[0] * size[1] * 3], size
+
+    def thumbnail(self, image_path):
+        entry = self.entry(image_path)
+        if entry is None:
+            return None
+        return self.pixels(entry['thumbnail'])
+
+    def level(self, image_path, min_size):
+        # Plus petite résolution qui couvre min_size, sinon la plus grande disponible
+        entry = self.entry(image_path)
+        if entry is None:
+            return None
+        levels = entry['levels']
+        for blob in levels:
+            if blob['width'] >= min_size[0] or blob['height'] >= min_size[1]:
+                return self.pixels(blob)
+        return self.pixels(levels[-1])
+
+
+def build_pack(assets_dir, pack_path, thumbnail_size, level_sizes):
+    from PIL import Image
+
+    images = {}
+    blobs = []
+    for name in sorted(os.listdir(assets_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(assets_dir, name)
+        try:
+            image = Image.open(image_path)
+            image = image.convert('RGB')
+        except Exception as e:
+            print(f"Image ignorée {name} : {e}")
+            continue
+
+        thumbnail = image.copy()
+        thumbnail.thumbnail(thumbnail_size, Image.Resampling.LANCZOS)
+
+        # Une résolution par taille de plateau standard, sans jamais agrandir l'original
+        sizes = sorted({min(fit_size(image.size, level_size), image.size) for level_size in level_sizes})
+        levels = [image if size == image.size else image.resize(size) for size in sizes]
+
+        images[name] = {
+            'key': list(file_key(image_path)),
+            'thumbnail': len(blobs),
+            'levels': [len(blobs) + 1 + i for i in range(len(levels))],
+        }
+        blobs.append(thumbnail)
+        blobs.extend(levels)
+
+    # Les positions dépendent de la taille de l'index : on les calcule avec un index provisoire
+    def layout(index_length):
+        offset = align(PACK_HEADER.size + index_length)
+        placed = []
+        for blob in blobs:
+            placed.append({'offset': offset, 'width': blob.width, 'height': blob.height})
+            offset = align(offset + blob.width * blob.height * 3)
+        index = {'version': 1, 'images': {
+            name: {
+                'key': entry['key'],
+                'thumbnail': placed[entry['thumbnail']],
+                'levels': [placed[i] for i in entry['levels']],
+            }
+            for name, entry in images.items()
+        }}
+        return placed, json.dumps(index).encode('utf-8')
+
+    index_length = 0
+    while True:
+        placed, index_data = layout(index_length)
+        if len(index_data) <= index_length:
+            break
+        index_length = len(index_data) + 1024
+    index_data = index_data.ljust(index_length)
+
+    tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, index_length))
+        f.write(index_data)
+        for blob, position in zip(blobs, placed):
+            f.seek(position['offset'])
+            f.write(blob.tobytes())
+        f.truncate(align(f.tell()))
+    os.replace(tmp_path, pack_path)
+    return len(images)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit le pack d'images pré-décodées du jeu")
+    parser.add_argument("assets_dir", nargs="?", default=os.path.join(SCRIPT_DIR, "assets"))
+    parser.add_argument("-o", "--output", default=os.path.join(SCRIPT_DIR, PACK_FILE))
+    args = parser.parse_args(argv)
+
+    level_sizes = [board_max_size(resolution) for resolution in PACK_RESOLUTIONS]
+    count = build_pack(args.assets_dir, args.output, THUMBNAIL_SIZE, level_sizes)
+    print(f"{count} images écrites dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
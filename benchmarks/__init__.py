@@ -0,0 +1,4 @@
+# Benchmarks headless de PuzzleGame (pilote SDL "dummy")
+#
+#   python -m benchmarks -o resultats.json
+#   python -m benchmarks --compare avant.json
@@ -0,0 +1,524 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Le pilote vidéo doit être choisi avant l'import de pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import pygame
+import puzzle
+import puzzle_server
+import verify_moves
+
+GRID_SIZES = [(4, 6), (6, 8), (10, 12), (20, 24), (100, 100)]
+ANIMATED_COUNTS = [48, 1000, 10000]
+# Fenêtre des mesures de plateau : 100×100 pièces y tiennent avec leurs marges
+BOARD_WINDOW_SIZE = (1900, 1000)
+DRAW_FRAMES = 120
+# Coups joués par le bot entre deux images
+BOT_MOVES_PER_FRAME = 32
+# Sessions simultanées sur le serveur, réparties sur quelques connexions
+SERVER_SESSIONS = 2000
+SERVER_CONNECTIONS = 20
+# Journaux de coups rejoués par le vérificateur, dont quelques-uns falsifiés
+VERIFY_LOGS = 5000
+VERIFY_TAMPERED = 50
+# Bibliothèque d'images simulée pour la galerie du menu (liens vers les images du jeu)
+GALLERY_IMAGES = 500
+# Processus neuf : import du jeu, construction de PuzzleGame et première image du menu
+STARTUP_SCRIPT = (
+    "import puzzle; game = puzzle.PuzzleGame(); game.draw(); "
+    "print(game.startup_time)"
+)
+
+
+def summarize(samples):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    return {
+        "n": len(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms),
+        "median_ms": statistics.median(samples_ms),
+        "p95_ms": samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))],
+        "min_ms": samples_ms[0],
+        "max_ms": samples_ms[-1],
+    }
+
+
+def measure(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class SimulatedClock:
+    # Horloge d'animation qui avance d'une image à 60 fps à chaque lecture,
+    # pour que les animations durent le même nombre d'images quelle que soit la machine
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += puzzle.FRAME_BUDGET
+        return self.now
+
+
+def make_game(work_dir):
+    # Scores isolés pour ne pas toucher aux fichiers du joueur
+    game = puzzle.PuzzleGame()
+    game.highscores = puzzle.ScoreStore(work_dir)
+    game.animation_clock = SimulatedClock()
+    return game
+
+
+def pump(game):
+    for event in pygame.event.get():
+        game.handle_event(event)
+
+
+def post_click(pos):
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+
+
+def set_grid(game, grid_size):
+    game.fit_board_image(game.get_board_max_size(grid_size=grid_size))
+    game.set_grid_size(grid_size)
+    # Toutes les pièces doivent être dans la fenêtre, sinon la partie ne peut pas être finie
+    assert game.grid_size == tuple(grid_size), f"grille {grid_size} réduite à {game.grid_size}"
+    assert game.screen.get_rect().contains(game.get_piece_rect(grid_size[1] - 1, grid_size[0] - 1))
+    game.create_puzzle_pieces()
+    game.shuffle_pieces()
+    game.scene = puzzle.SCENE_PLAYING
+    game.invalidate()
+
+
+def solve(game):
+    # Résolution scriptée par clics : chaque case reçoit la pièce qui lui revient
+    frames = 0
+    owners = {game.pieces[i].correct_pos: i for i in range(len(game.pieces))}
+    for row in range(game.grid_size[1]):
+        for col in range(game.grid_size[0]):
+            index = owners[(row, col)]
+            current = game.pieces[index].target_pos
+            if list(current) == [row, col]:
+                continue
+            post_click(game.get_piece_rect(*current).center)
+            post_click(game.get_piece_rect(row, col).center)
+            pump(game)
+            while game.animation_in_progress:
+                game.draw()
+                frames += 1
+    # L'écran de victoire attend ESPACE pour revenir au menu
+    game.draw()
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+    pump(game)
+    return frames
+
+
+def play_bot(game):
+    # Bot qui joue la solution minimale sans attendre la fin des animations, avec une image
+    # tous les BOT_MOVES_PER_FRAME coups : charge la boucle de jeu, le compteur et le score
+    moves = 0
+    for cell1, cell2 in game.board.solution():
+        game.swap_pieces(game.board.cells[cell1], game.board.cells[cell2])
+        moves += 1
+        if moves % BOT_MOVES_PER_FRAME == 0:
+            game.draw()
+    while game.animation_in_progress:
+        game.draw()
+    return moves
+
+
+def load_gallery(game):
+    # Menu affiché une fois, puis attente des miniatures visibles et voisines
+    game.invalidate()
+    game.draw()
+    while game.thumbnails.pending:
+        concurrent.futures.wait(list(game.thumbnails.pending.values()))
+        pump(game)
+    game.draw()
+
+
+def reset_thumbnails(game, cache_dir):
+    game.thumbnail_cache = puzzle.ThumbnailCache(cache_dir)
+    game.thumbnails = puzzle.ThumbnailLoader(game.thumbnail_cache)
+    game.available_images = game.load_available_images()
+    game.image_buttons = game.create_image_buttons()
+
+
+def bench_startup(results, work_dir, repeat):
+    game = make_game(work_dir)
+    cache_dir = tempfile.mkdtemp(dir=work_dir)
+
+    def cold():
+        reset_thumbnails(game, tempfile.mkdtemp(dir=work_dir))
+        load_gallery(game)
+
+    def warm():
+        reset_thumbnails(game, cache_dir)
+        load_gallery(game)
+
+    results["startup.image_buttons.cold"] = measure(cold, repeat)
+    warm()
+    results["startup.image_buttons.warm"] = measure(warm, repeat)
+    results["startup.load_available_images"] = measure(game.load_available_images, repeat)
+
+
+def bench_gallery(results, work_dir):
+    # Grande bibliothèque : la mémoire et le temps d'une image du menu doivent rester constants
+    game = make_game(work_dir)
+    assets_dir = tempfile.mkdtemp(dir=work_dir)
+    for i in range(GALLERY_IMAGES):
+        image_name = game.available_images[i % len(game.available_images)]
+        os.symlink(
+            os.path.join(game.assets_dir, image_name),
+            os.path.join(assets_dir, f"{i:04d} {image_name}")
+        )
+    game.assets_dir = assets_dir
+    start = time.perf_counter()
+    reset_thumbnails(game, tempfile.mkdtemp(dir=work_dir))
+    load_gallery(game)
+    results["gallery.first_page"] = summarize([time.perf_counter() - start])
+
+    # Défilement jusqu'en bas, une image par cran de molette
+    samples = []
+    largest_cache = 0
+    while True:
+        scroll = game.gallery_scroll
+        pygame.event.post(pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=-1))
+        pump(game)
+        if game.gallery_scroll == scroll:
+            break
+        start = time.perf_counter()
+        game.draw()
+        samples.append(time.perf_counter() - start)
+        pump(game)
+        largest_cache = max(largest_cache, len(game.thumbnails.surfaces))
+    results["gallery.scroll_frame"] = summarize(samples)
+    results["gallery.scroll_frame"]["images"] = GALLERY_IMAGES
+    results["gallery.scroll_frame"]["max_thumbnails_in_memory"] = largest_cache
+
+
+def bench_process_startup(results, repeat):
+    # Mesuré dans un nouveau processus : c'est le lancement à froid d'une borne
+    startup_times = []
+    process_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        process_times.append(time.perf_counter() - start)
+        startup_times.append(float(output.strip().splitlines()[-1]))
+    results["startup.first_menu_frame"] = summarize(startup_times)
+    results["startup.process"] = summarize(process_times)
+
+
+def bench_start_game(results, work_dir, repeat):
+    game = make_game(work_dir)
+    for image_name in game.available_images:
+        def cold():
+            # Aucune préparation en arrière-plan ne doit tourner pendant la mesure
+            game.reset_game()
+            for future in game.prefetcher.futures.values():
+                future.exception()
+            game.prefetcher.futures.clear()
+
+        def prefetched():
+            game.reset_game()
+            game.prefetch_image(image_name)
+            game.prefetcher.take(os.path.join(game.assets_dir, image_name), game.get_image_max_size())
+
+        results[f"start_game.{image_name}"] = measure(
+            lambda: game.start_game_with_image(image_name), repeat, setup=cold
+        )
+        results[f"start_game.prefetched.{image_name}"] = measure(
+            lambda: game.start_game_with_image(image_name), repeat, setup=prefetched
+        )
+
+
+def bench_pieces(results, work_dir, repeat):
+    game = make_game(work_dir)
+    game.start_game_with_image(game.available_images[0])
+    for grid_size in GRID_SIZES:
+        label = f"{grid_size[0]}x{grid_size[1]}"
+        game.grid_size = grid_size
+        results[f"create_puzzle_pieces.{label}"] = measure(game.create_puzzle_pieces, repeat)
+        results[f"shuffle_pieces.{label}"] = measure(game.shuffle_pieces, repeat)
+
+
+def bench_draw(results, work_dir):
+    game = make_game(work_dir)
+    game.resize(BOARD_WINDOW_SIZE)
+
+    game.invalidate()
+    results["draw.menu.full"] = measure(lambda: (game.invalidate(), game.draw()), DRAW_FRAMES)
+    results["draw.menu.idle"] = measure(game.draw, DRAW_FRAMES)
+
+    game.start_game_with_image(game.available_images[0])
+    for grid_size in GRID_SIZES:
+        label = f"{grid_size[0]}x{grid_size[1]}"
+        set_grid(game, grid_size)
+        results[f"draw.game.full.{label}"] = measure(lambda: (game.invalidate(), game.draw()), DRAW_FRAMES)
+        results[f"draw.game.idle.{label}"] = measure(game.draw, DRAW_FRAMES)
+
+        # Images pendant l'animation d'un échange
+        samples = []
+        while len(samples) < DRAW_FRAMES:
+            game.swap_pieces(0, len(game.pieces) - 1)
+            while game.animation_in_progress and len(samples) < DRAW_FRAMES:
+                start = time.perf_counter()
+                game.draw()
+                samples.append(time.perf_counter() - start)
+            if game.scene == puzzle.SCENE_VICTORY:
+                set_grid(game, grid_size)
+        results[f"draw.game.swap.{label}"] = summarize(samples)
+
+        # Images pendant que toutes les pièces se déplacent (mélange complet)
+        samples = []
+        while len(samples) < DRAW_FRAMES:
+            set_grid(game, grid_size)
+            game.animator.targets[:] = game.animator.targets[::-1]
+            for piece in game.pieces:
+                piece.is_moving = True
+            game.animation_in_progress = True
+            while game.animation_in_progress and len(samples) < DRAW_FRAMES:
+                start = time.perf_counter()
+                game.draw()
+                samples.append(time.perf_counter() - start)
+        results[f"draw.game.move_all.{label}"] = summarize(samples)
+        set_grid(game, grid_size)
+
+        # Les images doivent tenir dans le budget de 16,6 ms, même avec 10 000 pièces
+        for kind in ("full", "idle", "swap", "move_all"):
+            result = results[f"draw.game.{kind}.{label}"]
+            result["within_budget"] = result["p95_ms"] <= puzzle.FRAME_BUDGET * 1000
+
+
+def bench_animation(results):
+    # Un pas d'animation quand toutes les pièces bougent en même temps (mélange complet)
+    for count in ANIMATED_COUNTS:
+        animator = puzzle.PieceAnimator(count, SimulatedClock())
+
+        def setup():
+            animator.targets[:] = animator.targets[::-1]
+            animator.moving[:] = True
+
+        results[f"animation.update_all.{count}"] = measure(animator.update, DRAW_FRAMES, setup=setup)
+
+
+def bench_solve(results, work_dir, repeat):
+    game = make_game(work_dir)
+    for image_name in game.available_images[:2]:
+        for grid_size in GRID_SIZES[:3]:
+            label = f"{image_name}.{grid_size[0]}x{grid_size[1]}"
+            frames = []
+
+            def setup():
+                game.reset_game()
+                game.start_game_with_image(image_name)
+                set_grid(game, grid_size)
+
+            def run():
+                frames.append(solve(game))
+
+            results[f"solve.{label}"] = measure(run, repeat, setup=setup)
+            results[f"solve.{label}"]["frames"] = statistics.fmean(frames)
+
+
+def bench_bot(results, work_dir, repeat):
+    game = make_game(work_dir)
+    game.resize(BOARD_WINDOW_SIZE)
+    game.start_game_with_image(game.available_images[0])
+    for grid_size in GRID_SIZES:
+        label = f"{grid_size[0]}x{grid_size[1]}"
+        moves = []
+        samples = []
+        for _ in range(repeat):
+            set_grid(game, grid_size)
+            start = time.perf_counter()
+            moves.append(play_bot(game))
+            samples.append(time.perf_counter() - start)
+            assert game.scene == puzzle.SCENE_VICTORY
+        results[f"bot.{label}"] = summarize(samples)
+        results[f"bot.{label}"]["moves"] = statistics.fmean(moves)
+        results[f"bot.{label}"]["moves_per_second"] = sum(moves) / sum(samples)
+
+
+def bench_solver(results, repeat):
+    for grid_size in GRID_SIZES:
+        board = puzzle.Board(grid_size)
+        board.shuffle()
+        results[f"solver.min_swaps.{grid_size[0]}x{grid_size[1]}"] = measure(board.solution, repeat)
+
+
+async def server_client(port, image_names, sessions):
+    # Un client qui ouvre ses sessions puis les résout en entrelaçant les échanges
+    reader, writer = await asyncio.open_connection(puzzle_server.SERVER_HOST, port)
+    requests = 0
+
+    async def call(request):
+        nonlocal requests
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        requests += 1
+        return json.loads(await reader.readline())
+
+    plans = {}
+    for i in range(sessions):
+        response = await call({"op": "new", "image": image_names[i % len(image_names)]})
+        board = puzzle.Board.from_cells(tuple(response["layout"]["grid"]), response["cells"])
+        plans[response["session"]] = iter(board.solution())
+    solved = 0
+    while plans:
+        for session in list(plans):
+            # Un plateau mélangé déjà rangé reçoit un échange neutre pour être validé
+            cells = next(plans[session], (0, 0))
+            response = await call({"op": "swap", "session": session, "cells": list(cells)})
+            if response["solved"]:
+                solved += 1
+                del plans[session]
+    writer.close()
+    await writer.wait_closed()
+    return requests, solved
+
+
+async def run_server_load(work_dir, image_names):
+    server = puzzle_server.create_server(scores_dir=work_dir)
+    listener = await server.serve(puzzle_server.SERVER_HOST, 0)
+    port = listener.sockets[0].getsockname()[1]
+    per_client = SERVER_SESSIONS // SERVER_CONNECTIONS
+    start = time.perf_counter()
+    totals = await asyncio.gather(*(
+        server_client(port, image_names, per_client) for _ in range(SERVER_CONNECTIONS)
+    ))
+    elapsed = time.perf_counter() - start
+    listener.close()
+    await listener.wait_closed()
+    return elapsed, sum(requests for requests, _ in totals), sum(solved for _, solved in totals)
+
+
+def bench_server(results, work_dir):
+    image_names = make_game(work_dir).available_images
+    elapsed, requests, solved = asyncio.run(run_server_load(work_dir, image_names))
+    assert solved == SERVER_SESSIONS
+    results["server.sessions"] = {
+        "sessions": SERVER_SESSIONS,
+        "connections": SERVER_CONNECTIONS,
+        "requests": requests,
+        "total_ms": elapsed * 1000,
+        "median_ms": elapsed * 1000,
+        "requests_per_second": requests / elapsed,
+    }
+
+
+def bench_verify(results, work_dir):
+    # Parties résolues par le solveur, puis falsification du dernier coup de quelques-unes
+    path = os.path.join(work_dir, "verify.moves")
+    with open(path, 'wb') as f:
+        for i in range(VERIFY_LOGS):
+            engine = puzzle.PuzzleEngine("bench", GRID_SIZES[i % 3], seed=i)
+            for cell1, cell2 in engine.board.solution():
+                engine.swap(cell1, cell2)
+            if i % (VERIFY_LOGS // VERIFY_TAMPERED) == 0 and engine.moves:
+                engine.move_log.pop()
+                engine.move_log.append(engine.move_log[-1])
+            engine.check_win()
+            engine.score = engine.score or 1000
+            f.write(engine.encode_move_log())
+    start = time.perf_counter()
+    verified = verify_moves.verify_file(path)
+    elapsed = time.perf_counter() - start
+    assert len(verified) == VERIFY_LOGS
+    assert sum(1 for result in verified if not result["ok"]) == VERIFY_TAMPERED
+    results["verify.move_logs"] = {
+        "logs": VERIFY_LOGS,
+        "total_ms": elapsed * 1000,
+        "median_ms": elapsed * 1000,
+        "logs_per_second": VERIFY_LOGS / elapsed,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"{'benchmark':50} {'avant':>10} {'après':>10} {'ratio':>7}")
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        print(f"{name:50} {before['median_ms']:10.3f} {result['median_ms']:10.3f} {ratio:7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks headless de PuzzleGame")
+    parser.add_argument("-o", "--output", help="fichier JSON de résultats (stdout par défaut)")
+    parser.add_argument("--repeat", type=int, default=5, help="répétitions par mesure")
+    parser.add_argument("--compare", help="fichier JSON d'un run précédent à comparer")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        bench_process_startup(results, args.repeat)
+        bench_startup(results, work_dir, args.repeat)
+        bench_gallery(results, work_dir)
+        bench_start_game(results, work_dir, args.repeat)
+        bench_pieces(results, work_dir, args.repeat)
+        bench_draw(results, work_dir)
+        bench_animation(results)
+        bench_solve(results, work_dir, max(1, args.repeat // 2))
+        bench_bot(results, work_dir, max(1, args.repeat // 2))
+        bench_solver(results, args.repeat)
+        bench_server(results, work_dir)
+        bench_verify(results, work_dir)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
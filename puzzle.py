@@ -1,55 +1,468 @@
+import time
+# Instant de l'import du jeu : le démarrage est mesuré jusqu'à la première image du menu
+STARTUP_T0 = time.perf_counter()
+
 import pygame
 import sys
-import random
-from PIL import Image, ImageDraw
-import time
 from pathlib import Path
+from collections import OrderedDict, deque
+import csv
 import json
 import os
-import numpy as np
+import hashlib
+import math
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from asset_pack import AssetPack, IMAGE_EXTENSIONS, PACK_FILE, SCRIPT_DIR
+from puzzle_layout import BOARD_PADDING, LEADERBOARD_WIDTH, THUMBNAIL_SIZE, board_max_size, fit_size
+from puzzle_engine import (
+    Board, PuzzleEngine, ScoreStore, GRID_SIZE, MAX_GRID_SIZE, default_grid_size, fit_grid_size
+)
 
-# Initialisation de Pygame
-pygame.init()
+# Initialisation de Pygame : seulement l'affichage et les polices (ni son, ni manettes)
+# NumPy et Pillow sont importés à la première utilisation, hors du chemin de démarrage
+pygame.display.init()
+pygame.font.init()
 
 # Constantes
-GRID_SIZE = (6, 8)  # Nombre de pièces
+# Niveaux de difficulté : None garde la grille adaptée à l'orientation de l'image
+DIFFICULTIES = [("Normal", None), ("Expert", (30, 40)), ("Extrême", MAX_GRID_SIZE)]
 MARGIN = 2
+# Taille minimale d'une pièce (en pixels) : la grille est réduite si la fenêtre est trop petite
+MIN_PIECE_SIZE = 4
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GRAY = (128, 128, 128)
 ANIMATION_SPEED = 10
+# Constante de temps équivalente à l'ancien lissage de 1/ANIMATION_SPEED par image à 60 fps
+ANIMATION_TIME_CONSTANT = -1 / (60 * math.log(1 - 1 / ANIMATION_SPEED))
+ANIMATION_SNAP = 0.1
 HIGHSCORES_FILE = "highscores.txt"
+THUMBNAIL_CACHE_DIR = ".thumbnails"
+# Miniatures gardées en mémoire, quelle que soit la taille de la bibliothèque d'images
+THUMBNAIL_MEMORY_SIZE = 128
+THUMBNAIL_WORKERS = 4
+# Galerie du menu : bandeaux du haut (titre) et du bas (difficulté, explication du score)
+GALLERY_TOP = 100
+GALLERY_BOTTOM = 110
+GALLERY_LABEL_HEIGHT = 40
+GALLERY_MARGIN = 20
+GALLERY_SCROLL_STEP = 60
+# Rangées décodées au-delà de celles visibles, de chaque côté
+GALLERY_PRELOAD_ROWS = 1
+# Événement posté par les threads de décodage pour réveiller la boucle au repos
+THUMBNAIL_READY = pygame.event.custom_type()
+TEXT_CACHE_SIZE = 256
+FRAME_BUDGET = 1 / 60
+FRAME_PHASES = ("events", "animation", "pieces", "hud", "menu", "flip")
+PROFILER_HISTORY = 600
+TRACES_DIR = "traces"
+# Au-delà, une image entière est redessinée plutôt que chaque zone modifiée
+MAX_DIRTY_RECTS = 32
+PREFETCH_CACHE_SIZE = 4
+
+# Scènes du jeu et nombre d'images par seconde de chacune
+SCENE_MENU = "menu"
+SCENE_PLAYING = "playing"
+SCENE_VICTORY = "victory"
+SCENE_FPS = {SCENE_MENU: 30, SCENE_PLAYING: 60, SCENE_VICTORY: 10}
+# Attente maximale sur les événements quand rien ne s'anime
+IDLE_WAIT_MS = 1000
 
 # Define the background color
 BACKGROUND_COLOR = (250, 240, 202)  # RGB equivalent of #faf0ca
 
+def decode_source(image_path, max_size):
+    # Décodage à la plus petite résolution qui couvre encore max_size, sans rééchantillonnage fin
+    from PIL import Image
+    image = Image.open(image_path)
+    target = fit_size(image.size, max_size)
+    if image.format == 'JPEG':
+        # Le décodeur JPEG réduit l'image (1/2, 1/4, 1/8) sans descendre sous la cible
+        image.draft('RGB', target)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image
+
+def fit_image(image, max_size):
+    target = fit_size(image.size, max_size)
+    if image.size != target:
+        image = image.resize(target)
+    return image
+
+def pack_source(pack, image_path, max_size):
+    # Image source lue sans décodage ni copie dans le pack ; None s'il est absent ou périmé
+    if pack is None:
+        return None
+    level = pack.level(image_path, max_size)
+    if level is None:
+        return None
+    pixels, size = level
+    from PIL import Image
+    return Image.frombuffer('RGB', size, pixels, 'raw', 'RGB', 0, 1)
+
+def prepare_image(image_path, max_size, source_max_size=None, pack=None):
+    # Image source gardée en mémoire (jusqu'à source_max_size) et image du plateau,
+    # obtenue par un seul rééchantillonnage vers la taille finale
+    source = pack_source(pack, image_path, source_max_size or max_size)
+    if source is None:
+        source = decode_source(image_path, source_max_size or max_size)
+    return source, fit_image(source, max_size)
+
+class ImagePrefetcher:
+    # Prépare les images de puzzle dans un thread pendant que le menu est inactif
+    def __init__(self, max_entries=PREFETCH_CACHE_SIZE, pack=None):
+        self.max_entries = max_entries
+        self.pack = pack
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.futures = OrderedDict()
+
+    @staticmethod
+    def prepare(image_path, max_size, source_max_size=None, pack=None):
+        source, image = prepare_image(image_path, max_size, source_max_size, pack)
+        return source, image, image.tobytes()
+
+    def request(self, image_path, max_size, source_max_size=None):
+        key = (image_path, tuple(max_size))
+        if key in self.futures:
+            self.futures.move_to_end(key)
+            return
+        self.futures[key] = self.pool.submit(self.prepare, image_path, max_size, source_max_size, self.pack)
+        if len(self.futures) > self.max_entries:
+            _, future = self.futures.popitem(last=False)
+            future.cancel()
+
+    def take(self, image_path, max_size):
+        # Image préparée, en attendant la fin d'une préparation déjà lancée ; None sinon
+        future = self.futures.get((image_path, tuple(max_size)))
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            # print(f"Erreur lors de la préparation de {image_path}: {e}")
+            return None
+
+class PieceAnimator:
+    # Positions et cibles de toutes les pièces dans des tableaux NumPy contigus (en cases)
+    def __init__(self, count, clock=time.perf_counter):
+        import numpy as np
+        self.positions = np.zeros((count, 2), dtype=np.float64)
+        self.targets = np.zeros((count, 2), dtype=np.float64)
+        self.moving = np.zeros(count, dtype=bool)
+        self.clock = clock
+        self.last_tick = clock()
+
+    def start(self, slot):
+        if not self.moving.any():
+            self.last_tick = self.clock()
+        self.moving[slot] = True
+
+    def update(self):
+        # Avance toutes les pièces en mouvement d'un seul pas vectorisé, proportionnel au temps écoulé
+        import numpy as np
+        now = self.clock()
+        dt = now - self.last_tick
+        self.last_tick = now
+        
+        slots = np.flatnonzero(self.moving)
+        if not slots.size:
+            return slots, self.positions[slots]
+        previous = self.positions[slots]
+        targets = self.targets[slots]
+        
+        positions = previous + (targets - previous) * (1 - math.exp(-dt / ANIMATION_TIME_CONSTANT))
+        arrived = np.all(np.abs(targets - positions) < ANIMATION_SNAP, axis=1)
+        positions[arrived] = targets[arrived]
+        
+        self.positions[slots] = positions
+        self.moving[slots[arrived]] = False
+        return slots, previous
+
 class PuzzlePiece:
-    def __init__(self, surface, current_pos, correct_pos, piece_id):
+    __slots__ = ('surface', 'animator', 'slot', 'correct_pos', 'piece_id')
+
+    def __init__(self, surface, animator, slot, correct_pos, piece_id):
         self.surface = surface
-        self.current_pos = list(current_pos)
+        self.animator = animator
+        self.slot = slot
         self.correct_pos = correct_pos
-        self.target_pos = list(current_pos)
-        self.is_moving = False
         self.piece_id = piece_id
-        
-    def update(self):
-        if self.is_moving:
-            dx = (self.target_pos[0] - self.current_pos[0]) / ANIMATION_SPEED
-            dy = (self.target_pos[1] - self.current_pos[1]) / ANIMATION_SPEED
-            
-            self.current_pos[0] += dx
-            self.current_pos[1] += dy
-            
-            if abs(self.target_pos[0] - self.current_pos[0]) < 0.1 and abs(self.target_pos[1] - self.current_pos[1]) < 0.1:
-                self.current_pos = list(self.target_pos)
-                self.is_moving = False
-                return True
-        return False
+        self.current_pos = correct_pos
+        self.target_pos = correct_pos
+
+    @property
+    def current_pos(self):
+        return self.animator.positions[self.slot]
+
+    @current_pos.setter
+    def current_pos(self, pos):
+        self.animator.positions[self.slot] = pos
+
+    @property
+    def target_pos(self):
+        return self.animator.targets[self.slot]
+
+    @target_pos.setter
+    def target_pos(self, pos):
+        self.animator.targets[self.slot] = pos
+
+    @property
+    def is_moving(self):
+        return bool(self.animator.moving[self.slot])
+
+    @is_moving.setter
+    def is_moving(self, moving):
+        if moving:
+            self.animator.start(self.slot)
+        else:
+            self.animator.moving[self.slot] = False
+
+class TextCache:
+    # Cache LRU des surfaces de texte rendues et des polices chargées
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.fonts = {}
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            # Convertie au format de l'écran (avec alpha) pour des blits sans conversion
+            surface = font.render(text, antialias, color).convert_alpha()
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.maxsize:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+class ThumbnailCache:
+    # Cache disque des miniatures du menu, indexé par chemin, mtime et taille du fichier
+    def __init__(self, cache_dir, size=THUMBNAIL_SIZE, pack=None):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.pack = pack
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except Exception as e:
+            # print(f"Impossible de créer le cache des miniatures : {e}")
+            pass
+
+    def cache_path(self, image_path):
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size[0]}x{self.size[1]}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".rgb")
+
+    def read(self, cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                width, height = struct.unpack("<II", f.read(8))
+                data = f.read()
+        except Exception:
+            return None
+        if len(data) != width * height * 3:
+            return None
+        return (width, height), data
+
+    def write(self, cache_path, size, data):
+        # Écriture atomique : fichier temporaire puis renommage
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(struct.pack("<II", *size))
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            # print(f"Impossible d'écrire la miniature {cache_path} : {e}")
+            pass
+
+    def decode(self, image_path, cache_path):
+        # Exécuté dans un thread : Pillow relâche le GIL pendant le décodage
+        from PIL import Image
+        try:
+            image = Image.open(image_path)
+            # Conserver les proportions pour la miniature
+            image.thumbnail(self.size, Image.Resampling.LANCZOS)
+            # Convertir en RGB si nécessaire (pour les images RGBA)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            data = image.tobytes()
+        except Exception as e:
+            # print(f"Erreur lors du chargement de {image_path}: {e}")
+            return None
+        self.write(cache_path, image.size, data)
+        return image.size, data
+
+    def load(self, image_path):
+        # (taille, pixels RGB) de la miniature : pack, puis cache disque, puis décodage ;
+        # None si l'image est illisible. Exécuté dans un thread de ThumbnailLoader
+        thumbnail = self.pack.thumbnail(image_path) if self.pack is not None else None
+        if thumbnail is not None:
+            pixels, size = thumbnail
+            return size, pixels
+        try:
+            cache_path = self.cache_path(image_path)
+        except OSError:
+            return None
+        return self.read(cache_path) or self.decode(image_path, cache_path)
+
+    def prune_stale(self, image_paths):
+        keep = set()
+        for image_path in image_paths:
+            try:
+                keep.add(self.cache_path(image_path))
+            except OSError:
+                pass
+        self.prune(keep)
+
+    def prune(self, keep):
+        # Supprimer les miniatures d'images modifiées ou retirées
+        try:
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if path not in keep:
+                    os.remove(path)
+        except Exception:
+            pass
+
+class ThumbnailLoader:
+    # Miniatures décodées à la demande par un pool de threads et gardées dans un cache LRU borné ;
+    # chaque décodage terminé poste THUMBNAIL_READY, la surface est créée dans le thread principal
+    def __init__(self, cache, maxsize=THUMBNAIL_MEMORY_SIZE):
+        self.cache = cache
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.pending = {}
+        self.failed = set()
+        self.pool = ThreadPoolExecutor(max_workers=min(THUMBNAIL_WORKERS, os.cpu_count() or 1))
+
+    def get(self, image_path):
+        surface = self.surfaces.get(image_path)
+        if surface is not None:
+            self.surfaces.move_to_end(image_path)
+        return surface
+
+    def request(self, image_paths):
+        # Lance le décodage des miniatures demandées et abandonne celles qui ne le sont plus
+        wanted = set(image_paths)
+        for image_path, future in list(self.pending.items()):
+            if image_path not in wanted and future.cancel():
+                del self.pending[image_path]
+        for image_path in image_paths:
+            if image_path in self.surfaces or image_path in self.pending or image_path in self.failed:
+                continue
+            future = self.pool.submit(self.cache.load, image_path)
+            future.add_done_callback(
+                lambda future, image_path=image_path: self.notify(image_path, future)
+            )
+            self.pending[image_path] = future
+
+    def notify(self, image_path, future):
+        if future.cancelled():
+            return
+        try:
+            pygame.event.post(pygame.event.Event(THUMBNAIL_READY, path=image_path))
+        except pygame.error:
+            # Boucle d'affichage déjà arrêtée
+            pass
+
+    def collect(self, image_path):
+        # Appelé à la réception de THUMBNAIL_READY ; vrai si une nouvelle miniature est disponible
+        future = self.pending.get(image_path)
+        if future is None or not future.done():
+            return False
+        del self.pending[image_path]
+        try:
+            entry = future.result()
+        except Exception as e:
+            # print(f"Erreur lors du chargement de {image_path}: {e}")
+            entry = None
+        if entry is None:
+            self.failed.add(image_path)
+            return False
+        size, pixels = entry
+        self.surfaces[image_path] = pygame.image.frombuffer(pixels, size, 'RGB').convert()
+        while len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return True
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(q / 100 * (len(sorted_values) - 1)))]
+
+class FrameProfiler:
+    # Durée de chaque phase d'une image, conservée dans un tampon circulaire
+    def __init__(self, history=PROFILER_HISTORY):
+        self.frames = deque(maxlen=history)
+        self.begin_frame()
+
+    def begin_frame(self):
+        self.frame_start = self.last_mark = time.perf_counter()
+        self.phases = dict.fromkeys(FRAME_PHASES, 0.0)
+
+    def mark(self, phase):
+        # Attribue à la phase le temps écoulé depuis la marque précédente
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        total = time.perf_counter() - self.frame_start
+        self.frames.append((self.frame_start, *(self.phases[phase] for phase in FRAME_PHASES), total))
+
+    def stats(self):
+        totals = sorted(frame[-1] for frame in self.frames)
+        phases = {}
+        for i, phase in enumerate(FRAME_PHASES, start=1):
+            phases[phase] = percentile(sorted(frame[i] for frame in self.frames), 99)
+        return {
+            "frames": len(totals),
+            "p50": percentile(totals, 50),
+            "p99": percentile(totals, 99),
+            "dropped": sum(1 for total in totals if total > FRAME_BUDGET),
+            "phases_p99": phases,
+        }
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "start_ms", *(f"{phase}_ms" for phase in FRAME_PHASES), "total_ms"])
+            for i, frame in enumerate(self.frames):
+                writer.writerow([i, *(f"{value * 1000:.3f}" for value in frame)])
+
+    def export_chrome_trace(self, path):
+        # Format "Trace Event" lisible par chrome://tracing et Perfetto (durées en µs)
+        events = []
+        for i, frame in enumerate(self.frames):
+            start = frame[0] * 1e6
+            events.append({"name": "frame", "ph": "X", "ts": start, "dur": frame[-1] * 1e6,
+                           "pid": 1, "tid": 1, "args": {"frame": i}})
+            offset = start
+            for phase, duration in zip(FRAME_PHASES, frame[1:-1]):
+                if duration:
+                    events.append({"name": phase, "ph": "X", "ts": offset, "dur": duration * 1e6,
+                                   "pid": 1, "tid": 1})
+                    offset += duration * 1e6
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
 
 class PuzzleGame:
     def __init__(self):
         # Obtenir le chemin absolu du dossier du script
-        self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.script_dir = SCRIPT_DIR
         self.assets_dir = os.path.join(self.script_dir, "assets")
         
         # Vérifier si le dossier assets existe déjà
@@ -64,6 +477,9 @@ class PuzzleGame:
         # Initialisation de la fenêtre maximisée
         info = pygame.display.Info()
         self.window_size = (info.current_w - 20, info.current_h - 80)
+        # Résolution utile maximale : celle d'un plateau en plein écran
+        self.source_max_size = self.get_board_max_size((info.current_w, info.current_h))
+        self.pending_resize = None
         self.screen = pygame.display.set_mode(self.window_size, pygame.RESIZABLE)
         pygame.display.set_caption("Puzzle - Menu Principal")
         
@@ -71,119 +487,281 @@ class PuzzleGame:
         
         # États du jeu
         self.is_running = True
-        self.in_menu = True
+        self.scene = SCENE_MENU
         self.current_image = None
         self.start_time = None
         self.elapsed_time = 0
         self.score = 0
         self.selected_piece = None
         self.animation_in_progress = False
+        self.animation_clock = time.perf_counter
+        self.grid_size = GRID_SIZE
+        self.difficulty = 0
+        self.pieces = []
+        # Règles de la partie en cours (plateau, victoire, score), indépendantes du rendu
+        self.engine = None
+        self.board = None
+        # Indice affiché (touche H) et résolution automatique (touche A)
+        self.hint_cells = None
+        self.auto_solving = False
+        
+        # Zones de l'écran à rafraîchir à la prochaine image
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.time_rect = pygame.Rect(200, 10, 190, 30)
+        # Fonds statiques pré-composés de chaque scène
+        self.layers = {}
+        
+        # Instrumentation des phases de chaque image (F3 : affichage, F4 : export)
+        self.profiler = FrameProfiler()
+        self.show_profiler = False
+        # Durée entre l'import du module et la première image du menu (en secondes)
+        self.startup_time = None
         
         # Police pour le texte
-        self.font = pygame.font.Font(None, 36)
-        self.title_font = pygame.font.Font(None, 74)
+        self.text_cache = TextCache()
+        self.font = self.text_cache.font(36)
+        self.title_font = self.text_cache.font(74)
         
         # Bouton retour au menu
         self.home_button = pygame.Rect(10, 10, 150, 40)
         self.home_button_color = (250, 240, 202)
         
-        # Charger les images disponibles
+        # Pack d'images pré-décodées, s'il a été construit ; sinon décodage des fichiers
+        self.asset_pack = AssetPack.open(os.path.join(self.script_dir, PACK_FILE))
+        
+        # Charger les images disponibles ; leurs miniatures sont décodées à l'affichage
+        self.thumbnail_cache = ThumbnailCache(
+            os.path.join(self.script_dir, THUMBNAIL_CACHE_DIR), pack=self.asset_pack
+        )
+        self.thumbnails = ThumbnailLoader(self.thumbnail_cache)
+        self.gallery_scroll = 0
         self.available_images = self.load_available_images()
         self.image_buttons = self.create_image_buttons()
         
         # Charger les meilleurs scores
-        self.highscores = self.load_highscores()
-        if not isinstance(self.highscores, dict):
-            self.highscores = {}
+        self.highscores = ScoreStore(self.script_dir)
+        
+        # Préparation anticipée de l'image survolée ou la plus jouée
+        self.prefetcher = ImagePrefetcher(pack=self.asset_pack)
+        self.prefetch_favorite()
 
     def load_image(self, image_path):
         try:
-            self.original_image = Image.open(image_path)
             # Ajuster la taille de l'image pour qu'elle rentre dans l'écran
-            max_width = self.window_size[0] - 300  # Plus de marge pour les scores
-            max_height = self.window_size[1] - 100
-            
-            # Calculer le ratio en préservant l'orientation
-            width_ratio = max_width / self.original_image.width
-            height_ratio = max_height / self.original_image.height
-            ratio = min(width_ratio, height_ratio)
-            
-            new_width = int(self.original_image.width * ratio)
-            new_height = int(self.original_image.height * ratio)
-            
-            self.original_image = self.original_image.resize((new_width, new_height))
-            self.image_width = new_width
-            self.image_height = new_height
+            prepared = self.prefetcher.take(image_path, self.get_image_max_size())
+            if prepared is None:
+                prepared = ImagePrefetcher.prepare(
+                    image_path, self.get_image_max_size(), self.source_max_size, self.asset_pack
+                )
+            self.source_image, self.original_image, self.image_data = prepared
+            self.image_width, self.image_height = self.original_image.size
             
-            # Ajuster GRID_SIZE en fonction de l'orientation
-            if new_width > new_height:  # Image en paysage
-                global GRID_SIZE
-                GRID_SIZE = (4, 6)  # Moins de pièces en hauteur
-            else:  # Image en portrait
-                GRID_SIZE = (6, 8)  # Plus de pièces en hauteur
+            # Ajuster la grille en fonction de l'orientation
+            self.grid_size = default_grid_size(self.original_image.size)
                 
         except Exception as e:
             # print(f"Erreur lors du chargement de l'image {image_path}: {e}")
             sys.exit(1)
 
+    def prefetch_image(self, image_name):
+        self.prefetcher.request(
+            os.path.join(self.assets_dir, image_name), self.get_image_max_size(), self.source_max_size
+        )
+
+    def get_board_max_size(self, window_size=None, grid_size=None):
+        # Place disponible pour l'image, moins les marges entre les pièces de la grille
+        width, height = board_max_size(window_size or self.window_size)
+        if grid_size is not None:
+            width -= (grid_size[0] - 1) * MARGIN
+            height -= (grid_size[1] - 1) * MARGIN
+        return max(1, width), max(1, height)
+
+    def get_image_max_size(self):
+        # Taille de l'image préparée pour le niveau choisi ; en Normal, la grille dépend de
+        # l'orientation de l'image et GRID_SIZE est la plus fine des deux
+        return self.get_board_max_size(grid_size=DIFFICULTIES[self.difficulty][1] or GRID_SIZE)
+
+    def fit_board_image(self, max_size):
+        # Rééchantillonnage depuis l'image source en mémoire, sans relire le disque
+        self.original_image = fit_image(self.source_image, max_size)
+        self.image_data = self.original_image.tobytes()
+        self.image_width, self.image_height = self.original_image.size
+
+    def set_grid_size(self, grid_size):
+        # L'image est réduite si le plateau et ses marges ne tiennent pas dans la fenêtre,
+        # puis la grille est limitée à des pièces d'au moins MIN_PIECE_SIZE pixels
+        max_size = self.get_board_max_size(grid_size=grid_size)
+        if self.image_width > max_size[0] or self.image_height > max_size[1]:
+            self.fit_board_image(max_size)
+        self.grid_size = fit_grid_size(
+            grid_size, (self.image_width // MIN_PIECE_SIZE, self.image_height // MIN_PIECE_SIZE)
+        )
+
     def create_puzzle_pieces(self):
-        piece_width = self.image_width // GRID_SIZE[0]
-        piece_height = self.image_height // GRID_SIZE[1]
+        self.animator = PieceAnimator(self.grid_size[0] * self.grid_size[1], self.animation_clock)
         
         self.pieces = []
         piece_id = 0
         
-        for i in range(GRID_SIZE[1]):
-            for j in range(GRID_SIZE[0]):
-                # Découpage de l'image
-                piece = self.original_image.crop((
-                    j * piece_width,
-                    i * piece_height,
-                    (j + 1) * piece_width,
-                    (i + 1) * piece_height
-                ))
-                
-                # Conversion en surface Pygame
-                mode = piece.mode
-                size = piece.size
-                data = piece.tobytes()
-                
-                piece_surface = pygame.image.fromstring(data, size, mode)
-                
+        for i in range(self.grid_size[1]):
+            for j in range(self.grid_size[0]):
                 self.pieces.append(PuzzlePiece(
-                    surface=piece_surface,
-                    current_pos=[i, j],
+                    surface=None,
+                    animator=self.animator,
+                    slot=piece_id,
                     correct_pos=(i, j),
                     piece_id=piece_id
                 ))
                 piece_id += 1
+        
+        self.slice_pieces()
 
-    def shuffle_pieces(self):
-        # Création d'une grille de positions fixes
-        positions = [(i, j) for i in range(GRID_SIZE[1]) for j in range(GRID_SIZE[0])]
+    def slice_pieces(self):
+        # Une seule surface pour toute l'image, les pièces en sont des vues (subsurface)
+        # Convertie au format de l'écran : les milliers de blits des grandes grilles évitent la conversion
+        self.atlas = pygame.image.fromstring(self.image_data, self.original_image.size, 'RGB').convert()
         
-        # Mélange des pièces tout en gardant la structure de la grille
-        random.shuffle(self.pieces)
+        piece_width = self.image_width // self.grid_size[0]
+        piece_height = self.image_height // self.grid_size[1]
+        for piece in self.pieces:
+            i, j = piece.correct_pos
+            # Découpage de l'image sans copie des pixels
+            piece.surface = self.atlas.subsurface(pygame.Rect(
+                j * piece_width,
+                i * piece_height,
+                piece_width,
+                piece_height
+            ))
+        self.update_piece_areas()
+
+    def update_piece_areas(self):
+        # Zone de chaque pièce dans l'atlas, dans l'ordre de self.pieces
+        self.piece_areas = [
+            pygame.Rect(piece.surface.get_offset(), piece.surface.get_size()) for piece in self.pieces
+        ]
+
+    def shuffle_pieces(self):
+        # Le plateau est une permutation des pièces sur les cases ; self.pieces reste dans
+        # l'ordre des pièces, qui est aussi celui des tableaux de l'animateur
+        self.engine = PuzzleEngine(self.current_image, self.grid_size, self.highscores)
+        self.board = self.engine.board
+        self.hint_cells = None
+        self.auto_solving = False
         
-        # Attribution des positions fixes aux pièces mélangées
-        for piece, (row, col) in zip(self.pieces, positions):
-            piece.current_pos = [row, col]
-            piece.target_pos = piece.current_pos.copy()
+        positions = [self.board.position(cell) for cell in self.board.where]
+        self.animator.positions[:] = positions
+        self.animator.targets[:] = positions
+        self.animator.moving[:] = False
+
+    @property
+    def placed_count(self):
+        # Compteur de pièces bien placées, tenu à jour par le plateau à chaque échange
+        return self.board.placed if self.board is not None else 0
+
+    @property
+    def progress(self):
+        if not self.pieces:
+            return 0.0
+        return self.placed_count / len(self.pieces)
+
+    def get_progress_text(self):
+        return f"{self.placed_count} / {len(self.pieces)} placées"
+
+    def get_progress_rect(self):
+        # Texte aligné à droite de la fenêtre : sa largeur dépend du nombre de pièces
+        width, height = self.font.size(self.get_progress_text())
+        return pygame.Rect(self.window_size[0] - 10 - width, 10, width, height)
+
+    def get_board_origin(self):
+        # Coin du plateau centré dans sa zone, à gauche du classement, marges entre les pièces comprises
+        columns, rows = self.grid_size
+        board_width = self.image_width // columns * columns + (columns - 1) * MARGIN
+        board_height = self.image_height // rows * rows + (rows - 1) * MARGIN
+        area_width, area_height = board_max_size(self.window_size)
+        return BOARD_PADDING + (area_width - board_width) // 2, BOARD_PADDING + (area_height - board_height) // 2
 
     def get_piece_rect(self, row, col):
-        piece_width = self.image_width // GRID_SIZE[0]
-        piece_height = self.image_height // GRID_SIZE[1]
-        x = (self.window_size[0] - self.image_width) // 2 + col * (piece_width + MARGIN)
-        y = (self.window_size[1] - self.image_height) // 2 + row * (piece_height + MARGIN)
+        piece_width = self.image_width // self.grid_size[0]
+        piece_height = self.image_height // self.grid_size[1]
+        origin_x, origin_y = self.get_board_origin()
+        x = origin_x + col * (piece_width + MARGIN)
+        y = origin_y + row * (piece_height + MARGIN)
         return pygame.Rect(x, y, piece_width, piece_height)
 
+    def get_cell_at(self, pos):
+        # Conversion arithmétique pixel -> (ligne, colonne), None hors d'une pièce
+        piece_width = self.image_width // self.grid_size[0]
+        piece_height = self.image_height // self.grid_size[1]
+        origin_x, origin_y = self.get_board_origin()
+        x = pos[0] - origin_x
+        y = pos[1] - origin_y
+        if x < 0 or y < 0:
+            return None
+        col, offset_x = divmod(x, piece_width + MARGIN)
+        row, offset_y = divmod(y, piece_height + MARGIN)
+        if col >= self.grid_size[0] or row >= self.grid_size[1]:
+            return None
+        # Les clics dans les marges entre les pièces sont ignorés
+        if offset_x >= piece_width or offset_y >= piece_height:
+            return None
+        return row, col
+
+    def swap_pieces(self, index1, index2):
+        piece1 = self.pieces[index1]
+        piece2 = self.pieces[index2]
+        
+        cell1 = self.board.where[index1]
+        cell2 = self.board.where[index2]
+        
+        placed_before = self.board.placed
+        progress_rect = self.get_progress_rect()
+        self.engine.swap(cell1, cell2)
+        if self.board.placed != placed_before:
+            # L'ancien texte et le nouveau n'ont pas forcément la même largeur
+            self.invalidate(progress_rect.union(self.get_progress_rect()))
+        self.clear_hint()
+        
+        piece1.target_pos = self.board.position(cell2)
+        piece2.target_pos = self.board.position(cell1)
+        
+        piece1.is_moving = True
+        piece2.is_moving = True
+        self.animation_in_progress = True
+
+    def show_hint(self):
+        # Encadre les deux cases d'un échange de la solution la plus courte
+        self.clear_hint()
+        hint = self.board.hint()
+        if hint is None:
+            return
+        self.hint_cells = [self.board.position(cell) for cell in hint]
+        for cell in self.hint_cells:
+            self.invalidate(self.get_piece_rect(*cell))
+
+    def clear_hint(self):
+        if self.hint_cells is not None:
+            for cell in self.hint_cells:
+                self.invalidate(self.get_piece_rect(*cell))
+            self.hint_cells = None
+
+    def auto_solve_step(self):
+        # Un échange de la solution par image, sans attendre la fin des animations en cours
+        hint = self.board.hint()
+        if hint is None:
+            self.auto_solving = False
+            return
+        if self.selected_piece is not None:
+            self.invalidate(self.get_piece_rect(*self.pieces[self.selected_piece].current_pos))
+            self.selected_piece = None
+        self.swap_pieces(self.board.cells[hint[0]], self.board.cells[hint[1]])
+
     def handle_click(self, pos):
         if self.in_menu:
-            # Gérer les clics dans le menu
-            for button in self.image_buttons:
-                if button['rect'].collidepoint(pos):
-                    self.start_game_with_image(button['name'])
-                    return
+            # Gérer les clics dans le menu (les images illisibles sont ignorées)
+            index = self.get_button_at(pos)
+            if index is not None and self.image_buttons[index]['path'] not in self.thumbnails.failed:
+                self.start_game_with_image(self.image_buttons[index]['name'])
             return
             
         # Vérifier si le bouton d'accueil a été cliqué
@@ -191,51 +769,44 @@ class PuzzleGame:
             self.reset_game()
             return
 
-        if self.animation_in_progress or self.in_menu:
+        if self.animation_in_progress or self.scene != SCENE_PLAYING:
             return
             
-        for i, piece in enumerate(self.pieces):
-            rect = self.get_piece_rect(*piece.current_pos)
-            if rect.collidepoint(pos):
-                if self.selected_piece is None:
-                    self.selected_piece = i
-                else:
-                    piece1 = self.pieces[self.selected_piece]
-                    piece2 = piece
-                    
-                    pos1 = piece1.current_pos.copy()
-                    pos2 = piece2.current_pos.copy()
-                    
-                    piece1.target_pos = pos2
-                    piece2.target_pos = pos1
-                    
-                    piece1.is_moving = True
-                    piece2.is_moving = True
-                    self.animation_in_progress = True
-                    
-                    self.selected_piece = None
-                    
-                    # Afficher l'état du puzzle après le mouvement
-                    # print("\nMouvement effectué !")
-                    # self.print_pieces_grid()
-                    return
+        cell = self.get_cell_at(pos)
+        if cell is None:
+            return
+        
+        i = self.board.cells[self.board.cell(*cell)]
+        if self.selected_piece is None:
+            self.selected_piece = i
+            self.invalidate(self.get_piece_rect(*cell))
+        else:
+            # Effacer le contour de sélection
+            self.invalidate(self.get_piece_rect(*self.pieces[self.selected_piece].current_pos))
+            self.swap_pieces(self.selected_piece, i)
+            self.selected_piece = None
+            
+            # Afficher l'état du puzzle après le mouvement
+            # print("\nMouvement effectué !")
+            # self.print_pieces_grid()
 
     def check_win(self):
-        for piece in self.pieces:
-            current_row, current_col = piece.current_pos
-            correct_row, correct_col = piece.correct_pos
-            if current_row != correct_row or current_col != correct_col:
-                return False
+        # Le moteur fixe le score et l'enregistre
+        if not self.engine.check_win():
+            return False
                 
         # Si on arrive ici, c'est que le puzzle est complété
-        self.score = max(1000 - int(self.elapsed_time), 0)
-        self.save_score()
+        self.score = self.engine.score
+        self.elapsed_time = self.engine.elapsed()
+        # Les meilleurs scores font partie des fonds du menu et du jeu
+        self.clear_layers()
         
         # Afficher le message de victoire
-        self.show_victory_message()
+        self.scene = SCENE_VICTORY
+        self.invalidate()
         return True
         
-    def show_victory_message(self):
+    def draw_victory_overlay(self):
         # Créer une surface semi-transparente
         overlay = pygame.Surface(self.window_size)
         overlay.fill((0, 0, 0))
@@ -243,13 +814,13 @@ class PuzzleGame:
         self.screen.blit(overlay, (0, 0))
         
         # Afficher le message de victoire
-        victory_font = pygame.font.Font(None, 74)
-        score_font = pygame.font.Font(None, 48)
+        victory_font = self.text_cache.font(74)
+        score_font = self.text_cache.font(48)
         
-        victory_text = victory_font.render("Félicitations !", True, (255, 255, 255))
-        score_text = score_font.render(f"Score: {self.score} points", True, (255, 255, 255))
-        menu_text = score_font.render("ESPACE : Menu Principal", True, (255, 255, 255))
-        quit_text = score_font.render("ÉCHAP : Quitter", True, (255, 255, 255))
+        victory_text = self.text_cache.render(victory_font, "Félicitations !", (255, 255, 255))
+        score_text = self.text_cache.render(score_font, f"Score: {self.score} points", (255, 255, 255))
+        menu_text = self.text_cache.render(score_font, "ESPACE : Menu Principal", (255, 255, 255))
+        quit_text = self.text_cache.render(score_font, "ÉCHAP : Quitter", (255, 255, 255))
         
         victory_rect = victory_text.get_rect(center=(self.window_size[0]//2, self.window_size[1]//2 - 100))
         score_rect = score_text.get_rect(center=(self.window_size[0]//2, self.window_size[1]//2))
@@ -260,74 +831,12 @@ class PuzzleGame:
         self.screen.blit(score_text, score_rect)
         self.screen.blit(menu_text, menu_rect)
         self.screen.blit(quit_text, quit_rect)
-        
-        pygame.display.flip()
-        
-        # Attendre la décision du joueur
-        waiting = True
-        while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        pygame.quit()
-                        sys.exit()
-                    elif event.key == pygame.K_SPACE:
-                        self.reset_game()
-                        waiting = False
-
-    def load_highscores(self):
-        score_file = os.path.join(self.script_dir, "high_score.json")
-        try:
-            if os.path.exists(score_file):
-                with open(score_file, 'r') as f:
-                    return json.load(f)
-            else:
-                return {}
-        except Exception as e:
-            # print(f"Erreur lors du chargement des scores : {e}")
-            return {}
-
-    def save_score(self):
-        if not self.current_image:
-            return
-            
-        score_file = os.path.join(self.script_dir, "high_score.json")
-        try:
-            # Créer ou charger le fichier de scores
-            if os.path.exists(score_file):
-                with open(score_file, 'r') as f:
-                    scores = json.load(f)
-            else:
-                scores = {}
-            
-            # Ajouter le nouveau score
-            if self.current_image not in scores:
-                scores[self.current_image] = []
-            
-            scores[self.current_image].append({
-                "score": self.score,
-                "date": time.strftime("%Y-%m-%d")
-            })
-            
-            # Sauvegarder le fichier
-            with open(score_file, 'w') as f:
-                json.dump(scores, f, indent=4)
-                
-            # Mettre à jour les scores en mémoire
-            self.highscores = scores
-            
-        except Exception as e:
-            # print(f"Erreur lors de la sauvegarde du score : {e}")
-            pass
 
-    def draw_home_button(self):
-        pygame.draw.rect(self.screen, self.home_button_color, self.home_button)
-        text = self.font.render("Menu Principal", True, BLACK)
+    def draw_home_button(self, surface):
+        pygame.draw.rect(surface, self.home_button_color, self.home_button)
+        text = self.text_cache.render(self.font, "Menu Principal", BLACK)
         text_rect = text.get_rect(center=self.home_button.center)
-        self.screen.blit(text, text_rect)
+        surface.blit(text, text_rect)
 
     def load_available_images(self):
         # Ordre spécifique des images
@@ -343,13 +852,11 @@ class PuzzleGame:
             "KC CALISTE 2.jpg"
         ]
         
-        # Vérifier quelles images sont disponibles
-        available = []
+        # Toutes les images du dossier : celles de l'équipe d'abord, puis les autres par nom
         try:
-            files = os.listdir(self.assets_dir)
-            for image in ordered_images:
-                if image in files:
-                    available.append(image)
+            files = {name for name in os.listdir(self.assets_dir) if name.lower().endswith(IMAGE_EXTENSIONS)}
+            available = [image for image in ordered_images if image in files]
+            available += sorted(files.difference(ordered_images), key=str.lower)
             # print(f"Images trouvées : {available}")  # Debug
         except Exception as e:
             # print(f"Erreur lors de la lecture du dossier assets : {e}")
@@ -358,215 +865,511 @@ class PuzzleGame:
         return available
 
     def create_image_buttons(self):
-        buttons = []
-        preview_size = (180, 180)  # Légèrement plus petit pour tout faire tenir
-        margin = 20
-        
-        # Calculer la position de départ pour centrer horizontalement toutes les images
-        total_width = preview_size[0] * 5 + margin * 4  # 5 images avec 4 marges entre elles
-        start_x = (self.window_size[0] - total_width) // 2
-        # Placer les images au milieu verticalement
-        start_y = self.window_size[1] // 2 - preview_size[1] // 2
-        
-        button_width = preview_size[0]
-        button_height = preview_size[1]
-
-        for i, image_name in enumerate(self.available_images):
-            x = start_x + i % 5 * (preview_size[0] + margin)
-            if i < 5:
-                y = start_y - 150  # Décalage vers le haut pour la première ligne
-            else:
-                y = start_y + (i // 5) * (preview_size[1] + margin)
-            
-            # Créer une miniature de l'image
-            image_path = os.path.join(self.assets_dir, image_name)
-            try:
-                # print(f"Chargement de l'image : {image_path}")  # Debug
-                image = Image.open(image_path)
-                # Conserver les proportions pour la miniature
-                image.thumbnail(preview_size, Image.Resampling.LANCZOS)
-                # Convertir en RGB si nécessaire (pour les images RGBA)
-                if image.mode in ('RGBA', 'P'):
-                    image = image.convert('RGB')
-                image_surface = pygame.image.fromstring(
-                    image.tobytes(), image.size, image.mode
-                )
-                buttons.append({
-                    'rect': pygame.Rect(x, y, preview_size[0], preview_size[1]),
-                    'image': image_surface,
-                    'name': image_name
-                })
-                # print(f"Image {image_name} chargée avec succès")  # Debug
-            except Exception as e:
-                # print(f"Erreur lors du chargement de {image_name}: {e}")
-                continue
+        # Aucune miniature n'est décodée ici : seules les rangées visibles le seront, à l'affichage
+        buttons = [
+            {'name': image_name, 'path': os.path.join(self.assets_dir, image_name)}
+            for image_name in self.available_images
+        ]
 
         if not buttons:
             # print("Aucune image n'a pu être chargée. Vérifiez que le dossier assets contient des images valides.")
             sys.exit(1)
             
         # print(f"Nombre de boutons créés : {len(buttons)}")  # Debug
+        self.thumbnail_cache.prune_stale([button['path'] for button in buttons])
+        self.image_buttons = buttons
+        self.layout_gallery()
         return buttons
 
-    def start_game_with_image(self, image_name):
+    def layout_gallery(self):
+        # Galerie défilante : autant de colonnes que la largeur de la fenêtre en permet
+        self.gallery_rect = pygame.Rect(
+            0, GALLERY_TOP, self.window_size[0], max(1, self.window_size[1] - GALLERY_TOP - GALLERY_BOTTOM)
+        )
+        self.gallery_pitch = (
+            THUMBNAIL_SIZE[0] + GALLERY_MARGIN,
+            THUMBNAIL_SIZE[1] + 2 * GALLERY_LABEL_HEIGHT + GALLERY_MARGIN
+        )
+        self.gallery_columns = max(1, (self.window_size[0] - GALLERY_MARGIN) // self.gallery_pitch[0])
+        rows = -(-len(self.image_buttons) // self.gallery_columns)
+        self.gallery_height = rows * self.gallery_pitch[1]
+
+        # Le cache doit contenir au moins toutes les miniatures demandées par une image, rangées
+        # partiellement visibles et préchargées comprises ; sinon chaque décodage en évince une encore demandée
+        requested_rows = self.gallery_rect.height // self.gallery_pitch[1] + 2 + 2 * GALLERY_PRELOAD_ROWS
+        self.thumbnails.maxsize = max(THUMBNAIL_MEMORY_SIZE, requested_rows * self.gallery_columns)
+
+        # Centrer horizontalement toutes les colonnes, et verticalement si tout tient à l'écran
+        self.gallery_origin = (
+            (self.window_size[0] - self.gallery_columns * self.gallery_pitch[0] + GALLERY_MARGIN) // 2,
+            self.gallery_rect.top + max(0, (self.gallery_rect.height - self.gallery_height) // 2)
+        )
+        self.scroll_gallery(0)
+
+    def scroll_gallery(self, delta):
+        scroll = max(0, min(self.gallery_scroll + delta, self.gallery_height - self.gallery_rect.height))
+        if scroll != self.gallery_scroll:
+            self.gallery_scroll = scroll
+            self.invalidate()
+
+    def get_button_rect(self, index):
+        row, col = divmod(index, self.gallery_columns)
+        return pygame.Rect(
+            self.gallery_origin[0] + col * self.gallery_pitch[0],
+            self.gallery_origin[1] + row * self.gallery_pitch[1] + GALLERY_LABEL_HEIGHT - self.gallery_scroll,
+            THUMBNAIL_SIZE[0],
+            THUMBNAIL_SIZE[1]
+        )
+
+    def get_button_at(self, pos):
+        # Conversion arithmétique pixel -> indice du bouton, None hors d'une miniature
+        if not self.gallery_rect.collidepoint(pos):
+            return None
+        x = pos[0] - self.gallery_origin[0]
+        y = pos[1] - self.gallery_origin[1] + self.gallery_scroll - GALLERY_LABEL_HEIGHT
+        if x < 0 or y < 0:
+            return None
+        col, offset_x = divmod(x, self.gallery_pitch[0])
+        row, offset_y = divmod(y, self.gallery_pitch[1])
+        if col >= self.gallery_columns or offset_x >= THUMBNAIL_SIZE[0] or offset_y >= THUMBNAIL_SIZE[1]:
+            return None
+        index = row * self.gallery_columns + col
+        return index if index < len(self.image_buttons) else None
+
+    def visible_rows(self, preload=0):
+        # Rangées de la galerie à l'écran, élargies de preload rangées de chaque côté
+        top = self.gallery_scroll - (self.gallery_origin[1] - self.gallery_rect.top)
+        first = max(0, top // self.gallery_pitch[1] - preload)
+        last = (top + self.gallery_rect.height) // self.gallery_pitch[1] + preload
+        rows = -(-len(self.image_buttons) // self.gallery_columns)
+        return range(first, min(last + 1, rows))
+
+    def resize(self, window_size):
+        # Nouvelle mise en page après un redimensionnement, sans relire les images sur le disque
+        self.window_size = window_size
+        if self.screen.get_size() != window_size:
+            self.screen = pygame.display.set_mode(window_size, pygame.RESIZABLE)
+        else:
+            self.screen = pygame.display.get_surface()
+        self.layout_gallery()
+        self.clear_layers()
+        
+        if self.in_menu:
+            self.prefetch_favorite()
+        elif self.pieces:
+            # Nouvelle taille de l'image pour la même grille, l'état du plateau est conservé
+            self.fit_board_image(self.get_resized_board_size())
+            self.slice_pieces()
+        self.invalidate()
+
+    def get_resized_board_size(self):
+        # La grille d'une partie en cours ne change pas : dans une fenêtre trop petite, les pièces
+        # gardent MIN_PIECE_SIZE pixels et restent cliquables, quitte à déborder de la fenêtre
+        max_size = self.get_board_max_size(grid_size=self.grid_size)
+        width, height = fit_size(self.source_image.size, max_size)
+        min_width = self.grid_size[0] * MIN_PIECE_SIZE
+        min_height = self.grid_size[1] * MIN_PIECE_SIZE
+        if width >= min_width and height >= min_height:
+            return max_size
+        ratio = max(min_width / self.source_image.width, min_height / self.source_image.height)
+        return (
+            math.ceil(self.source_image.width * ratio) + 1,
+            math.ceil(self.source_image.height * ratio) + 1
+        )
+
+    def start_game_with_image(self, image_name, grid_size=None):
         self.current_image = image_name
         image_path = os.path.join(self.assets_dir, image_name)
         self.load_image(image_path)
         
-        # Ajuster la taille de l'image pour qu'elle rentre dans l'écran
-        max_width = self.window_size[0] - 100
-        max_height = self.window_size[1] - 100
-        ratio = min(max_width / self.image_width, max_height / self.image_height)
-        self.image_width = int(self.image_width * ratio)
-        self.image_height = int(self.image_height * ratio)
-        self.original_image = self.original_image.resize((self.image_width, self.image_height))
+        # Grille propre à la partie : imposée, sinon celle du niveau de difficulté choisi
+        if grid_size is None:
+            grid_size = DIFFICULTIES[self.difficulty][1]
+        self.set_grid_size(grid_size or self.grid_size)
         
         # Création et mélange des pièces
         self.create_puzzle_pieces()
         self.shuffle_pieces()
         
-        # Démarrer le chronomètre
-        self.start_time = time.time()
-        self.in_menu = False
+        # Le chronomètre est celui de la partie, démarré au mélange
+        self.start_time = self.engine.start_time
+        self.scene = SCENE_PLAYING
+        self.clear_layers()
+        self.invalidate()
         pygame.display.set_caption(f"Puzzle - {image_name}")
 
+    @property
+    def in_menu(self):
+        return self.scene == SCENE_MENU
+
     def reset_game(self):
-        self.in_menu = True
+        self.scene = SCENE_MENU
         self.current_image = None
         self.start_time = None
         self.elapsed_time = 0
         self.score = 0
         self.selected_piece = None
         self.animation_in_progress = False
+        self.auto_solving = False
+        self.invalidate()
         pygame.display.set_caption("Puzzle - Menu Principal")
+        self.prefetch_favorite()
+
+    def prefetch_favorite(self):
+        names = [button['name'] for button in self.image_buttons]
+        if names:
+            self.prefetch_image(max(names, key=self.highscores.plays))
 
     def draw_menu(self):
-        self.screen.fill(BACKGROUND_COLOR)
+        # Fond pré-composé, puis seulement les rangées visibles de la galerie
+        self.screen.blit(self.get_layer(SCENE_MENU), (0, 0))
+        self.draw_gallery()
+
+    def draw_gallery(self):
+        # Les miniatures des rangées visibles et voisines sont demandées, les autres abandonnées
+        columns = self.gallery_columns
+        buttons = self.image_buttons
+        preload = self.visible_rows(GALLERY_PRELOAD_ROWS)
+        self.thumbnails.request([
+            button['path'] for button in buttons[preload.start * columns:preload.stop * columns]
+        ])
         
-        # Titre
-        title_text = self.title_font.render("Sélectionnez un Puzzle", True, BLACK)
-        title_rect = title_text.get_rect(center=(self.window_size[0]//2, 50))
-        self.screen.blit(title_text, title_rect)
-        
-        # Dessiner les boutons d'images
-        for button in self.image_buttons:
-            # Afficher le nom de l'image au-dessus (sans l'extension)
-            name = button['name'].rsplit('.', 1)[0]  # Enlever l'extension
-            name_text = self.font.render(name, True, BLACK)
-            name_rect = name_text.get_rect(midbottom=(button['rect'].centerx, button['rect'].top - 10))
-            self.screen.blit(name_text, name_rect)
-            
-            button['rect'].size = button['image'].get_size()  # Ajuste la taille du bouton à celle de l'image
-            pygame.draw.rect(self.screen, GRAY, button['rect'])  # Dessine le fond gris avec la nouvelle taille
+        self.screen.set_clip(self.gallery_rect)
+        for row in self.visible_rows():
+            for index in range(row * columns, min((row + 1) * columns, len(buttons))):
+                button = buttons[index]
+                rect = self.get_button_rect(index)
+                
+                # Afficher le nom de l'image au-dessus (sans l'extension)
+                name = button['name'].rsplit('.', 1)[0]  # Enlever l'extension
+                name_text = self.text_cache.render(self.font, name, BLACK)
+                self.screen.blit(name_text, name_text.get_rect(midbottom=(rect.centerx, rect.top - 10)))
+                
+                # Miniature centrée dans sa case, fond gris tant qu'elle n'est pas décodée
+                image = self.thumbnails.get(button['path'])
+                if image is None:
+                    pygame.draw.rect(self.screen, GRAY, rect)
+                else:
+                    self.screen.blit(image, image.get_rect(midtop=rect.midtop))
+                
+                # Afficher le meilleur score ou "NA" en dessous
+                best_score = self.highscores.best(button['name'])
+                if best_score is not None:
+                    score_text = self.text_cache.render(self.font, f"{best_score} pts", BLACK)
+                else:
+                    score_text = self.text_cache.render(self.font, "NA", BLACK)
+                self.screen.blit(score_text, score_text.get_rect(midtop=(rect.centerx, rect.bottom + 10)))
+        self.screen.set_clip(None)
 
-            # Dessiner l'image
-            image_rect = button['image'].get_rect(center=button['rect'].center)
-            self.screen.blit(button['image'], image_rect)
-            
-            # Afficher le meilleur score ou "NA" en dessous
-            if button['name'] in self.highscores and self.highscores[button['name']]:
-                best_score = max(score['score'] for score in self.highscores[button['name']])
-                score_text = self.font.render(f"{best_score} pts", True, BLACK)
+    def get_layer(self, scene):
+        # Parties immobiles de la scène (fond, titres, bouton, scores), composées une
+        # seule fois au format de l'écran ; la victoire réutilise le fond du jeu
+        key = SCENE_MENU if scene == SCENE_MENU else SCENE_PLAYING
+        layer = self.layers.get(key)
+        if layer is None:
+            layer = pygame.Surface(self.window_size).convert()
+            if key == SCENE_MENU:
+                self.draw_menu_layer(layer)
             else:
-                score_text = self.font.render("NA", True, BLACK)
-            score_rect = score_text.get_rect(midtop=(button['rect'].centerx, button['rect'].bottom + 10))
-            self.screen.blit(score_text, score_rect)
+                self.draw_game_layer(layer)
+            self.layers[key] = layer
+        return layer
+
+    def clear_layers(self):
+        # À appeler dès qu'un élément d'un fond change (taille, scores, difficulté, image)
+        self.layers = {}
+
+    def draw_menu_layer(self, surface):
+        surface.fill(BACKGROUND_COLOR)
         
-        # Add the score calculation message
-        score_info_text = self.font.render("Le score est calculé comme 1000 moins le temps passé à résoudre le puzzle en secondes.", True, BLACK)
-        self.screen.blit(score_info_text, (self.window_size[0] // 2 - 500, self.window_size[1] - 50))
+        # Titre
+        title_text = self.text_cache.render(self.title_font, "Sélectionnez un Puzzle", BLACK)
+        title_rect = title_text.get_rect(center=(self.window_size[0]//2, 50))
+        surface.blit(title_text, title_rect)
+        
+        # Niveau de difficulté (touche D)
+        difficulty_text = self.text_cache.render(self.font, f"Difficulté : {DIFFICULTIES[self.difficulty][0]} (D pour changer)", BLACK)
+        surface.blit(difficulty_text, difficulty_text.get_rect(center=(self.window_size[0] // 2, self.window_size[1] - 90)))
         
-        pygame.display.flip()
+        # Add the score calculation message
+        score_info_text = self.text_cache.render(self.font, "Le score est calculé comme 1000 moins le temps passé à résoudre le puzzle en secondes.", BLACK)
+        surface.blit(score_info_text, (self.window_size[0] // 2 - 500, self.window_size[1] - 50))
+
+    def invalidate(self, rect=None):
+        # Marque une zone à redessiner ; sans argument, tout l'écran
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
 
     def draw(self):
-        self.screen.fill(BACKGROUND_COLOR)
+        # Les redimensionnements reçus depuis la dernière image sont appliqués une seule fois
+        if self.pending_resize is not None:
+            self.resize(self.pending_resize)
+            self.pending_resize = None
         
         if self.in_menu:
-            self.draw_menu()
+            # Le menu est statique : il n'est redessiné qu'après invalidation
+            if self.full_redraw:
+                self.draw_menu()
+                self.profiler.mark("menu")
+            self.present()
             return
-            
-        # Dessin du bouton d'accueil
-        self.draw_home_button()
+        
+        # Résolution automatique : un échange par image
+        if self.auto_solving and self.scene == SCENE_PLAYING:
+            self.auto_solve_step()
         
         # Mise à jour des animations
         if self.animation_in_progress:
-            all_done = True
-            for piece in self.pieces:
-                if piece.is_moving:
-                    if piece.update():
-                        continue
-                    all_done = False
+            slots, previous = self.animator.update()
+            if len(slots) > MAX_DIRTY_RECTS:
+                self.invalidate()
+            else:
+                current = self.animator.positions[slots]
+                for old_pos, new_pos in zip(previous.tolist(), current.tolist()):
+                    self.invalidate(self.get_piece_rect(*old_pos).union(self.get_piece_rect(*new_pos)))
             
-            if all_done:
+            if not self.animator.moving.any():
                 self.animation_in_progress = False
-                if self.check_win():
-                    return
+                self.check_win()
+        self.profiler.mark("animation")
+
+        # Le texte du temps n'est redessiné que lorsque la seconde change (figé après la victoire)
+        if self.start_time and self.scene == SCENE_PLAYING:
+            elapsed_time = time.time() - self.start_time
+            if int(elapsed_time) != int(self.elapsed_time):
+                self.invalidate(self.time_rect)
+            self.elapsed_time = elapsed_time
+
+        # L'écran de victoire recouvre tout le plateau : toute modification le redessine entièrement
+        if len(self.dirty_rects) > MAX_DIRTY_RECTS or (self.dirty_rects and self.scene == SCENE_VICTORY):
+            self.full_redraw = True
+        if self.full_redraw:
+            self.draw_game_scene()
+            if self.scene == SCENE_VICTORY:
+                self.draw_victory_overlay()
+        else:
+            for rect in self.dirty_rects:
+                self.screen.set_clip(rect)
+                self.draw_game_scene(rect)
+            self.screen.set_clip(None)
+        self.present()
+
+    def present(self):
+        # Envoie à l'écran les zones modifiées
+        if self.show_profiler:
+            self.dirty_rects.append(self.draw_profiler_overlay())
+        if self.full_redraw:
+            pygame.display.flip()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+        self.full_redraw = False
+        self.dirty_rects = []
+        self.profiler.mark("flip")
+        if self.startup_time is None:
+            self.startup_time = time.perf_counter() - STARTUP_T0
+
+    def draw_profiler_overlay(self):
+        # Fond opaque : l'overlay recouvre entièrement ce qu'il y avait dessous
+        stats = self.profiler.stats()
+        slowest = max(stats['phases_p99'], key=stats['phases_p99'].get)
+        lines = [
+            f"Image p50 {stats['p50'] * 1000:.1f} ms  p99 {stats['p99'] * 1000:.1f} ms",
+            f"Images perdues: {stats['dropped']} / {stats['frames']}",
+            f"Phase p99 max: {slowest} {stats['phases_p99'][slowest] * 1000:.1f} ms",
+            f"Démarrage: {(self.startup_time or 0) * 1000:.0f} ms",
+        ]
+        font = self.text_cache.font(24)
+        rect = pygame.Rect(10, self.window_size[1] - 114, 360, 104)
+        pygame.draw.rect(self.screen, BLACK, rect)
+        # Rendu direct : ces textes changent à chaque image et videraient le cache LRU
+        for i, line in enumerate(lines):
+            self.screen.blit(font.render(line, True, WHITE), (rect.x + 8, rect.y + 8 + i * 24))
+        return rect
+
+    def export_profile(self):
+        traces_dir = os.path.join(self.script_dir, TRACES_DIR)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        try:
+            os.makedirs(traces_dir, exist_ok=True)
+            self.profiler.export_csv(os.path.join(traces_dir, f"frames-{stamp}.csv"))
+            self.profiler.export_chrome_trace(os.path.join(traces_dir, f"frames-{stamp}.json"))
+        except Exception as e:
+            # print(f"Erreur lors de l'export des mesures : {e}")
+            pass
+
+    def draw_game_scene(self, area=None):
+        # Redessine la scène de jeu ; si area est fourni, seuls les éléments qui la touchent
+        import numpy as np
+        # Fond statique pré-composé, copié seulement sur la zone à redessiner
+        layer = self.get_layer(SCENE_PLAYING)
+        if area is None:
+            self.screen.blit(layer, (0, 0))
+        else:
+            self.screen.blit(layer, area, area)
+        self.profiler.mark("hud")
         
-        # Dessin des pièces
-        for i, piece in enumerate(self.pieces):
-            rect = self.get_piece_rect(*piece.current_pos)
-            self.screen.blit(piece.surface, rect)
-            if i == self.selected_piece:
-                pygame.draw.rect(self.screen, (255, 0, 0), rect, 3)
+        # Dessin des pièces : positions calculées d'un coup, pièces hors zone écartées,
+        # puis un seul appel à blits (l'emplacement d'une pièce dans l'animateur est son indice)
+        piece_width = self.image_width // self.grid_size[0]
+        piece_height = self.image_height // self.grid_size[1]
+        origin_x, origin_y = self.get_board_origin()
+        positions = self.animator.positions
+        xs = (origin_x + positions[:, 1] * (piece_width + MARGIN)).astype(np.int64)
+        ys = (origin_y + positions[:, 0] * (piece_height + MARGIN)).astype(np.int64)
+        
+        clip = self.screen.get_rect() if area is None else area.clip(self.screen.get_rect())
+        visible = np.flatnonzero(
+            (xs < clip.right) & (xs + piece_width > clip.left) &
+            (ys < clip.bottom) & (ys + piece_height > clip.top)
+        )
+        # Blit depuis l'atlas avec la zone de chaque pièce : plus rapide que des subsurfaces
+        areas = self.piece_areas
+        if len(visible) < len(areas):
+            areas = [areas[i] for i in visible.tolist()]
+        self.screen.blits(
+            zip(repeat(self.atlas), zip(xs[visible].tolist(), ys[visible].tolist()), areas),
+            doreturn=False
+        )
+        
+        if self.selected_piece is not None:
+            rect = self.get_piece_rect(*positions[self.selected_piece].tolist())
+            pygame.draw.rect(self.screen, (255, 0, 0), rect, 3)
+        if self.hint_cells is not None:
+            for cell in self.hint_cells:
+                pygame.draw.rect(self.screen, (0, 160, 0), self.get_piece_rect(*cell), 3)
+        self.profiler.mark("pieces")
 
         # Affichage du temps
         if self.start_time:
-            self.elapsed_time = time.time() - self.start_time
-            time_text = self.font.render(f"Temps: {int(self.elapsed_time)}s", True, BLACK)
-            self.screen.blit(time_text, (200, 10))
+            time_text = self.text_cache.render(self.font, f"Temps: {int(self.elapsed_time)}s", BLACK)
+            self.screen.blit(time_text, self.time_rect.topleft)
+
+        # Affichage de la progression
+        progress_text = self.text_cache.render(self.font, self.get_progress_text(), BLACK)
+        self.screen.blit(progress_text, self.get_progress_rect())
+        self.profiler.mark("hud")
+
+    def draw_game_layer(self, surface):
+        surface.fill(BACKGROUND_COLOR)
+        
+        # Dessin du bouton d'accueil
+        self.draw_home_button(surface)
 
         # Affichage du meilleur score pour l'image actuelle
-        if self.current_image in self.highscores and self.highscores[self.current_image]:
-            best_score = max(score['score'] for score in self.highscores[self.current_image])
-            score_text = self.font.render(f"Meilleur score: {best_score} pts", True, BLACK)
-            self.screen.blit(score_text, (400, 10))
-
-        # Affichage du classement à droite
-        if self.current_image in self.highscores and self.highscores[self.current_image]:
-            scores = sorted(self.highscores[self.current_image], key=lambda x: x['score'], reverse=True)[:5]
-            title_text = self.font.render("Top 5 Scores:", True, BLACK)
-            self.screen.blit(title_text, (self.window_size[0] - 200, 50))
+        best_score = self.highscores.best(self.current_image)
+        if best_score is not None:
+            score_text = self.text_cache.render(self.font, f"Meilleur score: {best_score} pts", BLACK)
+            surface.blit(score_text, (400, 10))
+
+        # Affichage du classement dans sa colonne à droite, que le plateau ne recouvre pas
+        scores = self.highscores.top_scores(self.current_image)[:5]
+        if scores:
+            leaderboard_x = self.window_size[0] - LEADERBOARD_WIDTH + 10
+            title_text = self.text_cache.render(self.font, "Top 5 Scores:", BLACK)
+            surface.blit(title_text, (leaderboard_x, 50))
             
             for i, score in enumerate(scores):
-                score_text = self.font.render(f"{score['score']} pts", True, BLACK)
-                self.screen.blit(score_text, (self.window_size[0] - 200, 90 + i * 30))
-
-        pygame.display.flip()
+                score_text = self.text_cache.render(self.font, f"{score['score']} pts", BLACK)
+                surface.blit(score_text, (leaderboard_x, 90 + i * 30))
 
     def print_pieces_grid(self):
-        # Créer une grille vide
-        grid = [[None for _ in range(GRID_SIZE[0])] for _ in range(GRID_SIZE[1])]
-        
-        # Remplir la grille avec les IDs des pièces
-        for piece in self.pieces:
-            row, col = piece.current_pos
-            grid[row][col] = piece.piece_id
+        # IDs des pièces ligne par ligne, lus directement dans la permutation du plateau
+        grid = self.board.rows()
             
         # print("\nÉtat actuel du puzzle:")
-        # print("-" * (GRID_SIZE[0] * 4 + 1))
+        # print("-" * (self.grid_size[0] * 4 + 1))
         # for row in grid:
         #     print("|", end=" ")
         #     for piece_id in row:
         #         print(f"{piece_id:2}", end=" |")
-        #     print("\n" + "-" * (GRID_SIZE[0] * 4 + 1))
+        #     print("\n" + "-" * (self.grid_size[0] * 4 + 1))
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.is_running = False
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.invalidate()
+        elif event.type == pygame.VIDEORESIZE:
+            self.pending_resize = (max(1, event.w), max(1, event.h))
+        elif event.type == THUMBNAIL_READY:
+            if self.thumbnails.collect(event.path) and self.in_menu:
+                self.invalidate()
+        elif event.type == pygame.MOUSEWHEEL and self.in_menu:
+            self.scroll_gallery(-event.y * GALLERY_SCROLL_STEP)
+        elif event.type == pygame.MOUSEMOTION and self.in_menu:
+            index = self.get_button_at(event.pos)
+            if index is not None:
+                self.prefetch_image(self.image_buttons[index]['name'])
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if not self.animation_in_progress and self.scene != SCENE_VICTORY:
+                self.handle_click(event.pos)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                if self.scene == SCENE_PLAYING:
+                    self.reset_game()
+                else:
+                    self.is_running = False
+            elif event.key == pygame.K_SPACE and self.scene == SCENE_VICTORY:
+                self.reset_game()
+            elif event.key == pygame.K_h and self.scene == SCENE_PLAYING:
+                self.show_hint()
+            elif event.key == pygame.K_a and self.scene == SCENE_PLAYING:
+                self.auto_solving = not self.auto_solving
+                self.engine.ranked = False
+            elif event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN) and self.in_menu:
+                direction = -1 if event.key == pygame.K_PAGEUP else 1
+                self.scroll_gallery(direction * self.gallery_rect.height)
+            elif event.key == pygame.K_d and self.in_menu:
+                self.difficulty = (self.difficulty + 1) % len(DIFFICULTIES)
+                self.clear_layers()
+                self.invalidate()
+                # L'image préparée dépend des marges de la grille du niveau
+                self.prefetch_favorite()
+            elif event.key == pygame.K_F3:
+                self.show_profiler = not self.show_profiler
+                if not self.show_profiler:
+                    self.invalidate()
+            elif event.key == pygame.K_F4:
+                self.export_profile()
+
+    def next_wakeup(self):
+        # Délai en ms avant la prochaine image nécessaire, 0 tant que quelque chose s'anime
+        if self.animation_in_progress or self.show_profiler or self.full_redraw or self.dirty_rects:
+            return 0
+        if self.auto_solving:
+            return 0
+        if self.pending_resize is not None:
+            return 0
+        if self.scene == SCENE_PLAYING and self.start_time:
+            # Réveil juste après le changement de seconde pour rafraîchir "Temps:"
+            elapsed_time = time.time() - self.start_time
+            return min(IDLE_WAIT_MS, int((1 - elapsed_time % 1) * 1000) + 1)
+        return IDLE_WAIT_MS
+
+    def wait_events(self):
+        # Bloque sur la file d'événements tant qu'il n'y a rien à animer
+        timeout = self.next_wakeup()
+        if not timeout:
+            return pygame.event.get(), False
+        event = pygame.event.wait(timeout)
+        events = [] if event.type == pygame.NOEVENT else [event]
+        return events + pygame.event.get(), True
 
     def run(self):
         while self.is_running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.is_running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if not self.animation_in_progress:
-                        self.handle_click(event.pos)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        if not self.in_menu:
-                            self.reset_game()
-                        else:
-                            self.is_running = False
+            events, idle = self.wait_events()
+            self.profiler.begin_frame()
+            for event in events:
+                self.handle_event(event)
+            self.profiler.mark("events")
 
             self.draw()
-            self.clock.tick(60)
+            self.profiler.end_frame()
+            # Cadence de la scène uniquement pendant les animations
+            if not idle:
+                self.clock.tick(SCENE_FPS[self.scene])
 
         pygame.quit()
         sys.exit()
@@ -0,0 +1,413 @@
+import json
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+
+# Règles du puzzle sans rendu : plateau, partie et scores (sans pygame ni Pillow)
+#
+# Les cases sont numérotées ligne par ligne ; la pièce n est à sa place sur la case n.
+
+GRID_SIZE = (6, 8)  # Nombre de pièces (colonnes, lignes) pour une image en portrait
+LANDSCAPE_GRID_SIZE = (4, 6)  # Moins de pièces en hauteur pour une image en paysage
+MAX_GRID_SIZE = (100, 100)
+SCORES_FILE = "high_score.json"
+SCORES_LOG_FILE = "high_score.log"
+SCORES_TOP_K = 5
+SCORES_COMPACT_THRESHOLD = 100
+# Journal binaire des parties classées : en-tête, nom de l'image, puis les échanges (uint16)
+MOVES_FILE = "high_score.moves"
+MOVE_LOG_MAGIC = b"KCML"
+MOVE_LOG_VERSION = 1
+MOVE_LOG_HEADER = struct.Struct("<4sBBHHIiI")
+
+
+def default_grid_size(image_size):
+    # Grille adaptée à l'orientation de l'image
+    if image_size[0] > image_size[1]:  # Image en paysage
+        return LANDSCAPE_GRID_SIZE
+    return GRID_SIZE
+
+
+def fit_grid_size(grid_size, image_size):
+    # Au moins une pièce, au plus MAX_GRID_SIZE et un pixel par pièce
+    return (
+        max(1, min(grid_size[0], MAX_GRID_SIZE[0], image_size[0])),
+        max(1, min(grid_size[1], MAX_GRID_SIZE[1], image_size[1]))
+    )
+
+
+def score_for(elapsed_time):
+    return max(1000 - int(elapsed_time), 0)
+
+
+def move_log_name(image):
+    # Nom de l'image tel qu'enregistré : 255 octets au plus, sans couper un caractère
+    return image.encode('utf-8')[:255].decode('utf-8', 'ignore')
+
+
+def encode_move_log(image, grid_size, seed, score, moves):
+    # Quelques octets par coup : deux numéros de case sur 16 bits, en petit-boutiste
+    name = move_log_name(image).encode('utf-8')
+    if sys.byteorder != 'little':
+        moves = array('H', moves)
+        moves.byteswap()
+    header = MOVE_LOG_HEADER.pack(
+        MOVE_LOG_MAGIC, MOVE_LOG_VERSION, len(name), grid_size[0], grid_size[1], seed, score, len(moves) // 2
+    )
+    return header + name + moves.tobytes()
+
+
+def split_move_logs(data):
+    # (position, enregistrement) de chaque partie d'un fichier de journaux, sans décoder les coups
+    offset = 0
+    while offset + MOVE_LOG_HEADER.size <= len(data):
+        magic, _, name_length, _, _, _, _, count = MOVE_LOG_HEADER.unpack_from(data, offset)
+        if magic != MOVE_LOG_MAGIC:
+            raise ValueError(f"journal corrompu à l'octet {offset}")
+        end = offset + MOVE_LOG_HEADER.size + name_length + count * 4
+        if end > len(data):
+            # Dernier enregistrement tronqué par une écriture interrompue
+            break
+        yield offset, data[offset:end]
+        offset = end
+
+
+def decode_move_log(record):
+    magic, version, name_length, columns, rows, seed, score, count = MOVE_LOG_HEADER.unpack_from(record)
+    if magic != MOVE_LOG_MAGIC or version != MOVE_LOG_VERSION:
+        raise ValueError("journal de coups inconnu")
+    start = MOVE_LOG_HEADER.size + name_length
+    moves = array('H')
+    moves.frombytes(record[start:start + count * 4])
+    if sys.byteorder != 'little':
+        moves.byteswap()
+    return {
+        'image': record[MOVE_LOG_HEADER.size:start].decode('utf-8'),
+        'grid_size': (columns, rows),
+        'seed': seed,
+        'score': score,
+        'moves': moves,
+    }
+
+
+def replay_move_log(log):
+    # Rejoue le mélange et les échanges sur un plateau neuf : vrai si le plateau finit rangé
+    board = Board(log['grid_size'])
+    board.shuffle(random.Random(log['seed']))
+    count = len(board)
+    moves = log['moves']
+    for i in range(0, len(moves), 2):
+        cell1 = moves[i]
+        cell2 = moves[i + 1]
+        if cell1 >= count or cell2 >= count:
+            return False
+        board.swap(cell1, cell2)
+    return board.is_solved() and 0 <= log['score'] <= 1000
+
+
+def min_swaps(cells):
+    # Suite minimale d'échanges (case, case) qui range le plateau, par décomposition en cycles :
+    # chaque échange ramène une pièce chez elle, un cycle de k pièces coûte k - 1 échanges. O(n)
+    cells = array(cells.typecode, cells)
+    swaps = []
+    for cell in range(len(cells)):
+        while cells[cell] != cell:
+            piece = cells[cell]
+            swaps.append((cell, piece))
+            cells[cell] = cells[piece]
+            cells[piece] = piece
+    return swaps
+
+
+class Board:
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        count = grid_size[0] * grid_size[1]
+        # cells[case] = pièce posée sur la case, where[pièce] = case de la pièce
+        self.cells = array('I', range(count))
+        self.where = array('I', range(count))
+        self.placed = count
+        # Début de la recherche du prochain indice : les cases précédentes sont souvent rangées
+        self.hint_cursor = 0
+
+    @classmethod
+    def from_cells(cls, grid_size, cells):
+        board = cls(grid_size)
+        board.cells = array('I', cells)
+        for cell, piece in enumerate(board.cells):
+            board.where[piece] = cell
+        board.placed = sum(1 for cell, piece in enumerate(board.cells) if cell == piece)
+        return board
+
+    def __len__(self):
+        return len(self.cells)
+
+    def shuffle(self, rng=random):
+        pieces = list(range(len(self.cells)))
+        rng.shuffle(pieces)
+        self.cells = array('I', pieces)
+        for cell, piece in enumerate(pieces):
+            self.where[piece] = cell
+        self.placed = sum(1 for cell, piece in enumerate(pieces) if cell == piece)
+        self.hint_cursor = 0
+
+    def cell(self, row, col):
+        return row * self.grid_size[0] + col
+
+    def position(self, cell):
+        return divmod(cell, self.grid_size[0])
+
+    def is_solved(self):
+        return self.placed == len(self.cells)
+
+    def swap(self, cell1, cell2):
+        cells = self.cells
+        piece1 = cells[cell1]
+        piece2 = cells[cell2]
+        self.placed += (piece2 == cell1) + (piece1 == cell2) - (piece1 == cell1) - (piece2 == cell2)
+        cells[cell1] = piece2
+        cells[cell2] = piece1
+        self.where[piece2] = cell1
+        self.where[piece1] = cell2
+
+    def hint(self):
+        # Un échange d'une solution minimale : la première case mal remplie reçoit sa pièce ;
+        # None si le plateau est rangé
+        cells = self.cells
+        count = len(cells)
+        for offset in range(count):
+            cell = (self.hint_cursor + offset) % count
+            if cells[cell] != cell:
+                self.hint_cursor = cell
+                return cell, self.where[cell]
+        return None
+
+    def solution(self):
+        return min_swaps(self.cells)
+
+    def rows(self):
+        columns = self.grid_size[0]
+        return [self.cells[i:i + columns].tolist() for i in range(0, len(self.cells), columns)]
+
+
+class PuzzleEngine:
+    # Une partie : mélange, échanges, victoire et score, sans fenêtre ni boucle d'affichage
+    def __init__(self, image, grid_size, scores=None, seed=None, clock=time.time):
+        self.image = image
+        self.grid_size = grid_size
+        self.scores = scores
+        self.clock = clock
+        # Le mélange est entièrement déterminé par la graine : la partie peut être rejouée
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.board = Board(grid_size)
+        self.board.shuffle(random.Random(self.seed))
+        self.start_time = clock()
+        self.end_time = None
+        # Cases échangées, deux à deux
+        self.move_log = array('H')
+        self.score = None
+        # Une partie terminée par la résolution automatique n'entre pas au classement
+        self.ranked = True
+
+    @property
+    def finished(self):
+        return self.score is not None
+
+    @property
+    def moves(self):
+        return len(self.move_log) // 2
+
+    def elapsed(self):
+        return (self.end_time or self.clock()) - self.start_time
+
+    def swap(self, cell1, cell2):
+        if self.finished:
+            raise ValueError("la partie est terminée")
+        count = len(self.board)
+        if not (0 <= cell1 < count and 0 <= cell2 < count):
+            raise ValueError(f"case hors du plateau ({count} cases)")
+        self.board.swap(cell1, cell2)
+        self.move_log.append(cell1)
+        self.move_log.append(cell2)
+
+    def check_win(self):
+        if self.finished:
+            return True
+        if not self.board.is_solved():
+            return False
+        self.end_time = self.clock()
+        self.score = score_for(self.end_time - self.start_time)
+        self.save_score()
+        return True
+
+    def save_score(self):
+        if self.scores is None or not self.ranked:
+            return
+        self.scores.add(self.image, self.score, self.encode_move_log())
+
+    def encode_move_log(self):
+        return encode_move_log(self.image, self.grid_size, self.seed, self.score, self.move_log)
+
+
+class ScoreStore:
+    # Scores : instantané JSON compacté + journal en ajout seul, index en mémoire par image
+    def __init__(self, directory, top_k=SCORES_TOP_K):
+        self.snapshot_path = os.path.join(directory, SCORES_FILE)
+        self.log_path = os.path.join(directory, SCORES_LOG_FILE)
+        self.moves_path = os.path.join(directory, MOVES_FILE)
+        self.top_k = top_k
+        self.top = {}
+        # Scores écartés par la vérification : conservés à part, ils n'occupent plus le classement
+        self.unverified = {}
+        self.counts = {}
+        self.log_entries = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            # print(f"Erreur lors du chargement des scores : {e}")
+            snapshot = {}
+        if not isinstance(snapshot, dict):
+            snapshot = {}
+        # Instantané {"scores": ..., "unverified": ..., "plays": ...} ; l'ancien format ne contient
+        # que les scores
+        plays = {}
+        if isinstance(snapshot.get('scores'), dict):
+            plays = snapshot.get('plays') or {}
+            self.unverified = snapshot.get('unverified') or {}
+            snapshot = snapshot['scores']
+        for image, entries in snapshot.items():
+            for entry in entries:
+                self.index(image, entry)
+        for image, count in plays.items():
+            self.counts[image] = max(self.counts.get(image, 0), count)
+
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.index(entry.pop('image'), entry)
+                    except (ValueError, KeyError, AttributeError):
+                        # Ligne tronquée par une écriture interrompue
+                        continue
+                    self.log_entries += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # print(f"Erreur lors de la lecture du journal des scores : {e}")
+            pass
+
+        if self.log_entries >= SCORES_COMPACT_THRESHOLD:
+            self.compact()
+
+    def index(self, image, entry):
+        # Seuls les top_k meilleurs scores de chaque image sont conservés ; la liste est remplacée
+        # et non modifiée sur place, pour les lectures pendant une écriture dans un autre thread
+        self.counts[image] = self.counts.get(image, 0) + 1
+        if entry.get('verified', True) is False:
+            self.unverified[image] = self.unverified.get(image, []) + [entry]
+            return
+        top = self.top.get(image, [])
+        if len(top) < self.top_k or entry['score'] > top[-1]['score']:
+            self.top[image] = sorted(top + [entry], key=lambda x: x['score'], reverse=True)[:self.top_k]
+
+    def best(self, image):
+        top = self.top_scores(image)
+        return top[0]['score'] if top else None
+
+    def top_scores(self, image):
+        return self.top.get(image, [])
+
+    def plays(self, image):
+        # Parties jouées sur l'image, y compris celles sorties du top_k
+        return self.counts.get(image, 0)
+
+    def add(self, image, score, move_log=None):
+        entry = {
+            "score": score,
+            "date": time.strftime("%Y-%m-%d")
+        }
+        if move_log is not None:
+            offset = self.append_move_log(move_log)
+            if offset is not None:
+                entry["moves"] = offset
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"image": image, **entry}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            # print(f"Erreur lors de la sauvegarde du score : {e}")
+            pass
+        self.index(image, entry)
+        self.log_entries += 1
+        if self.log_entries >= SCORES_COMPACT_THRESHOLD:
+            self.compact()
+
+    def append_move_log(self, move_log):
+        # Position de l'enregistrement dans le journal des coups, None si l'écriture échoue
+        try:
+            with open(self.moves_path, 'ab') as f:
+                offset = f.tell()
+                f.write(move_log)
+                f.flush()
+                os.fsync(f.fileno())
+            return offset
+        except Exception as e:
+            # print(f"Erreur lors de la sauvegarde des coups : {e}")
+            return None
+
+    def unverified_entries(self, records):
+        # Scores classés que leur partie ne justifie pas : records associe la position de chaque
+        # enregistrement rejoué à son résultat ({'ok', 'image', 'score'}). Un score est écarté si
+        # la partie n'aboutit pas, est introuvable, ou porte une autre image ou un autre score
+        unverified = []
+        for image, entries in self.top.items():
+            for entry in entries:
+                if 'moves' not in entry:
+                    # Sans journal : signalé par unrecorded_entries
+                    continue
+                record = records.get(entry['moves'])
+                if (record is None or not record['ok'] or record['image'] != move_log_name(image)
+                        or record['score'] != entry['score']):
+                    unverified.append((image, entry))
+        return unverified
+
+    def unrecorded_entries(self):
+        # Scores classés sans journal de coups (antérieurs aux journaux, ou ajoutés à la main) :
+        # aucune partie ne permet de les vérifier
+        return [(image, entry) for image, entries in self.top.items() for entry in entries if 'moves' not in entry]
+
+    def mark_unverified(self, entries):
+        # Retire du classement les scores (image, entrée) écartés par la vérification, les garde à
+        # part dans l'instantané, puis compacte ; les places libérées reviennent aux scores suivants
+        flagged = {id(entry) for _, entry in entries}
+        for image, entry in entries:
+            entry['verified'] = False
+            self.unverified[image] = self.unverified.get(image, []) + [entry]
+        for image in {image for image, _ in entries}:
+            self.top[image] = [entry for entry in self.top.get(image, []) if id(entry) not in flagged]
+        self.compact()
+
+    def compact(self):
+        # Réécrit l'instantané de façon atomique (fichier temporaire + renommage) puis vide le journal
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"scores": self.top, "unverified": self.unverified, "plays": self.counts}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.log_entries = 0
+        except Exception as e:
+            # print(f"Erreur lors de la compaction des scores : {e}")
+            pass
@@ -0,0 +1,20 @@
+# Dimensions de la mise en page, partagées par le jeu et la construction du pack d'images
+# (sans pygame : construire le pack n'ouvre pas de fenêtre)
+THUMBNAIL_SIZE = (180, 180)
+# Espace laissé autour du plateau (bandeau du haut compris)
+BOARD_PADDING = 50
+# Colonne du classement, à droite du plateau : les pièces ne la recouvrent jamais
+LEADERBOARD_WIDTH = 210
+
+
+def fit_size(size, max_size):
+    # Plus grande taille qui tient dans max_size en préservant les proportions
+    ratio = min(max_size[0] / size[0], max_size[1] / size[1])
+    return max(1, int(size[0] * ratio)), max(1, int(size[1] * ratio))
+
+
+def board_max_size(window_size):
+    return (
+        max(1, window_size[0] - BOARD_PADDING - LEADERBOARD_WIDTH),
+        max(1, window_size[1] - 2 * BOARD_PADDING)
+    )
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from puzzle_engine import PuzzleEngine, ScoreStore, default_grid_size, fit_grid_size
+
+# Serveur de parties sans rendu : une requête JSON par ligne, une réponse JSON par ligne
+#
+#   python puzzle_server.py --port 8765
+#
+#   {"op": "new", "image": "KC CANNA.jpg", "grid": [6, 8]}  -> {"ok": true, "session": 1, "cells": [...]}
+#   {"op": "swap", "session": 1, "cells": [0, 5]}           -> {"ok": true, "placed": 3, "solved": false, ...}
+#   {"op": "hint", "session": 1} / {"op": "state", "session": 1} / {"op": "close", "session": 1}
+#   {"op": "scores", "image": "KC CANNA.jpg"}
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Scores du serveur, séparés de ceux du jeu : chaque processus compacte son propre journal
+SERVER_SCORES_DIR = "server_scores"
+
+
+def integers(values, count, field):
+    # Liste JSON de count entiers : les flottants (1e400, Infinity) et les booléens sont refusés
+    if not isinstance(values, (list, tuple)) or len(values) != count or not all(type(n) is int for n in values):
+        raise ValueError(f"{field} : {count} entiers attendus")
+    return values
+
+
+class PieceLayout:
+    # Découpage d'une image en pièces, partagé par toutes les sessions sur la même image et
+    # la même grille : le serveur ne dessine rien, il n'a besoin que des dimensions
+    __slots__ = ('image_size', 'grid_size', 'piece_size')
+
+    def __init__(self, image_size, grid_size):
+        self.image_size = image_size
+        self.grid_size = grid_size
+        self.piece_size = (image_size[0] // grid_size[0], image_size[1] // grid_size[1])
+
+    def to_json(self):
+        return {
+            'image_size': list(self.image_size),
+            'grid': list(self.grid_size),
+            'piece_size': list(self.piece_size),
+        }
+
+
+class ImageCatalog:
+    # Dimensions des images du dossier assets, lues une seule fois dans l'en-tête du fichier
+    def __init__(self, assets_dir):
+        self.assets_dir = assets_dir
+        self.sizes = {}
+        self.layouts = {}
+
+    def image_size(self, image):
+        size = self.sizes.get(image)
+        if size is None:
+            # Pillow ne lit que l'en-tête : aucun pixel n'est décodé
+            from PIL import Image
+            try:
+                with Image.open(os.path.join(self.assets_dir, image)) as f:
+                    size = f.size
+            except OSError:
+                raise ValueError(f"image inconnue : {image}")
+            self.sizes[image] = size
+        return size
+
+    def layout(self, image, grid_size=None):
+        image_size = self.image_size(image)
+        if grid_size is None:
+            grid_size = default_grid_size(image_size)
+        grid_size = fit_grid_size(tuple(integers(grid_size, 2, "grid")), image_size)
+        key = (image, grid_size)
+        layout = self.layouts.get(key)
+        if layout is None:
+            layout = self.layouts[key] = PieceLayout(image_size, grid_size)
+        return layout
+
+
+class PuzzleServer:
+    def __init__(self, catalog, scores):
+        self.catalog = catalog
+        self.scores = scores
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        # Un seul thread d'écriture : les scores sont enregistrés dans l'ordre, sans bloquer la boucle
+        self.score_writer = ThreadPoolExecutor(max_workers=1)
+
+    def session(self, request, owned):
+        # Une connexion n'accède qu'aux sessions qu'elle a ouvertes : les numéros se devinent
+        session_id = request.get('session')
+        if type(session_id) is not int or session_id not in owned:
+            raise ValueError("session inconnue")
+        return self.sessions[session_id]
+
+    def state(self, session_id, engine):
+        return {
+            'ok': True,
+            'session': session_id,
+            'placed': engine.board.placed,
+            'pieces': len(engine.board),
+            'moves': engine.moves,
+            'elapsed': engine.elapsed(),
+            'solved': engine.finished,
+            'score': engine.score,
+        }
+
+    async def save_score(self, engine):
+        # Deux fsync et parfois une compaction : exécutés hors de la boucle, les autres sessions continuent
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.score_writer, self.scores.add, engine.image, engine.score, engine.encode_move_log()
+        )
+
+    async def dispatch(self, request, owned):
+        op = request.get('op')
+        if op == 'new':
+            image = os.path.basename(request['image'])
+            layout = self.catalog.layout(image, request.get('grid'))
+            # Sans store : le score est enregistré par save_score, hors de la boucle
+            engine = PuzzleEngine(image, layout.grid_size)
+            session_id = next(self.session_ids)
+            self.sessions[session_id] = engine
+            owned.add(session_id)
+            response = self.state(session_id, engine)
+            response['layout'] = layout.to_json()
+            response['cells'] = engine.board.cells.tolist()
+            return response
+        if op == 'swap':
+            engine = self.session(request, owned)
+            cell1, cell2 = integers(request['cells'], 2, "cells")
+            engine.swap(cell1, cell2)
+            if engine.check_win():
+                await self.save_score(engine)
+            return self.state(request['session'], engine)
+        if op == 'hint':
+            engine = self.session(request, owned)
+            hint = engine.board.hint()
+            return {'ok': True, 'session': request['session'], 'cells': list(hint) if hint else None}
+        if op == 'state':
+            engine = self.session(request, owned)
+            response = self.state(request['session'], engine)
+            response['cells'] = engine.board.cells.tolist()
+            return response
+        if op == 'close':
+            self.session(request, owned)
+            self.sessions.pop(request['session'])
+            owned.discard(request['session'])
+            return {'ok': True}
+        if op == 'scores':
+            image = os.path.basename(request['image'])
+            return {'ok': True, 'best': self.scores.best(image), 'top': self.scores.top_scores(image)}
+        raise ValueError(f"opération inconnue : {op}")
+
+    async def handle(self, reader, writer):
+        # Les sessions d'une connexion sont fermées avec elle
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.dispatch(json.loads(line), owned)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(response).encode('utf-8') + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Connexion coupée ou ligne plus longue que la limite du lecteur
+            pass
+        finally:
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        return await asyncio.start_server(self.handle, host, port, limit=1 << 20)
+
+
+def create_server(script_dir=SCRIPT_DIR, scores_dir=None):
+    catalog = ImageCatalog(os.path.join(script_dir, "assets"))
+    scores_dir = scores_dir or os.path.join(script_dir, SERVER_SCORES_DIR)
+    os.makedirs(scores_dir, exist_ok=True)
+    return PuzzleServer(catalog, ScoreStore(scores_dir))
+
+
+async def serve_forever(server, host, port):
+    listener = await server.serve(host, port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur de parties de puzzle (JSON par ligne)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--scores-dir", help=f"dossier des scores ({SERVER_SCORES_DIR}/ par défaut)")
+    args = parser.parse_args(argv)
+
+    server = create_server(scores_dir=args.scores_dir)
+    try:
+        asyncio.run(serve_forever(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from puzzle_engine import MOVES_FILE, ScoreStore, decode_move_log, replay_move_log, split_move_logs
+
+# Vérification des scores : chaque partie classée est rejouée depuis sa graine et ses coups
+#
+#   python verify_moves.py            (rapport des parties qui n'aboutissent pas)
+#   python verify_moves.py --mark     (marque aussi leurs scores, qui ne sont plus classés)
+#   python verify_moves.py --mark --strict  (et les scores sans journal de coups)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VERIFY_CHUNK_SIZE = 256
+
+
+def verify_record(item):
+    # Exécuté dans un processus du pool : décodage et rejeu d'un enregistrement
+    offset, record = item
+    try:
+        log = decode_move_log(record)
+    except ValueError as e:
+        return {'offset': offset, 'ok': False, 'error': str(e)}
+    return {
+        'offset': offset,
+        'ok': replay_move_log(log),
+        'image': log['image'],
+        'score': log['score'],
+        'moves': len(log['moves']) // 2,
+    }
+
+
+def verify_file(path, workers=None):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(verify_record, split_move_logs(data), chunksize=VERIFY_CHUNK_SIZE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejoue les journaux de coups et signale les scores invalides")
+    parser.add_argument("--scores-dir", default=SCRIPT_DIR, help="dossier des scores (celui du jeu par défaut)")
+    parser.add_argument("--workers", type=int, help="processus de vérification (un par cœur par défaut)")
+    parser.add_argument("--mark", action="store_true", help="marquer les scores invalides dans le classement")
+    parser.add_argument("--strict", action="store_true", help="tenir pour invalides les scores sans journal de coups")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(args.scores_dir, MOVES_FILE)
+    results = []
+    if os.path.exists(path):
+        try:
+            results = verify_file(path, args.workers)
+        except ValueError as e:
+            print(e)
+            return 2
+
+    failed = [result for result in results if not result['ok']]
+    for result in failed:
+        print(json.dumps(result, ensure_ascii=False))
+
+    # Les scores du classement doivent aussi correspondre à la partie qu'ils désignent
+    store = ScoreStore(args.scores_dir)
+    records = {result['offset']: result for result in results}
+    unverified = store.unverified_entries(records)
+    failed_offsets = {result['offset'] for result in failed}
+    mismatched = [(image, entry) for image, entry in unverified if entry['moves'] not in failed_offsets]
+    for image, entry in mismatched:
+        print(json.dumps({'image': image, **entry, 'error': "score sans partie correspondante"}, ensure_ascii=False))
+
+    # Scores sans journal de coups : antérieurs aux journaux, ou ajoutés à la main dans high_score.log
+    unrecorded = store.unrecorded_entries()
+    for image, entry in unrecorded:
+        print(json.dumps({'image': image, **entry, 'error': "aucun journal de coups"}, ensure_ascii=False))
+    print(
+        f"{len(results)} parties rejouées, {len(failed)} invalides, {len(mismatched)} scores modifiés, "
+        f"{len(unrecorded)} scores sans journal"
+    )
+
+    if args.strict:
+        unverified += unrecorded
+    if args.mark and unverified:
+        store.mark_unverified(unverified)
+    return 1 if unverified or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())